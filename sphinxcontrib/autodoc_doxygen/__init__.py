@@ -1,39 +1,147 @@
 import os.path
-from lxml import etree as ET
 from sphinx.errors import ExtensionError
 
+# Everything else (lxml, the index, the documenters and directives, the
+# stub generator) is only imported once it's needed, so that importing the
+# extension stays cheap.
+
+
+# (doxygen_xml directory, filter key) -> watcher keeping its index, with
+# doxygen_xml_watch
+_watchers = {}
+
 
 def set_doxygen_xml(app):
     """Load all doxygen XML files from the app config variable
     `app.config.doxygen_xml` which should be a path to a directory
-    containing doxygen xml output
+    containing doxygen xml output, or to an artifact compiled from one
+    with ``sphinx-doxygen-compile``.
+
+    If `app.config.doxygen_tagfile` is set, names and ids are resolved
+    from that tagfile instead, and the XML is only loaded once a
+    description is actually needed.
+
+    With `app.config.doxygen_xml_watch`, the index is kept in memory and
+    only the XML files changed since the previous build are parsed again.
+
+    The ``doxygen_include_*`` and ``doxygen_exclude_*`` settings select
+    the compounds and members to load, see `CompoundFilter`.
+    """
+    from .index import CompoundFilter
+    load_doxygen_index(app.config.doxygen_xml, app.config.doxygen_tagfile,
+                       watch=app.config.doxygen_xml_watch,
+                       compound_filter=CompoundFilter.from_config(app.config))
+
+
+def load_doxygen_index(doxygen_xml, doxygen_tagfile='', watch=False, compound_filter=None):
+    """Load the doxygen index from the directory *doxygen_xml* (or from
+    *doxygen_tagfile*, if given) and make it the current one.
+    """
+    if hasattr(setup, 'DOXYGEN_ROOT'):
+        del setup.DOXYGEN_ROOT
+
+    if doxygen_tagfile:
+        if not os.path.isfile(doxygen_tagfile):
+            raise ExtensionError(
+                '[sphinxcontrib-autodoc_doxygen] No doxygen tagfile found '
+                'in doxygen_tagfile="%s"' % doxygen_tagfile)
+        from .index import DoxygenTagIndex
+        setup.DOXYGEN_INDEX = DoxygenTagIndex.from_file(
+            doxygen_tagfile, lambda: load_doxygen_xml(doxygen_xml, watch, compound_filter),
+            compound_filter)
+    else:
+        setup.DOXYGEN_INDEX = load_doxygen_xml(doxygen_xml, watch, compound_filter)
+    return setup.DOXYGEN_INDEX
+
+
+def load_doxygen_xml(path, watch=False, compound_filter=None):
+    """Build a `DoxygenIndex` from the directory of doxygen xml output
+    at *path*, or from a tar or zip archive of it, or read it from the
+    artifact file at *path*.
+
+    If *watch* is true, the index is kept around and reused, or patched up
+    from the changed files only, the next time the same *path* is loaded.
+    Only what *compound_filter* accepts is loaded from XML; an artifact is
+    read as it was compiled.
     """
+    from .artifact import is_artifact, read_artifact
+    from .index import is_archive, DoxygenIndex, DoxygenXmlWatcher
+    if is_artifact(path):
+        return read_artifact(path)
+
     err = ExtensionError(
         '[sphinxcontrib-autodoc_doxygen] No doxygen '
-        'xml output found in doxygen_xml="%s"' % app.config.doxygen_xml)
+        'xml output found in doxygen_xml="%s"' % path)
 
-    if not os.path.isdir(app.config.doxygen_xml):
+    if is_archive(path):
+        import lzma
+        import tarfile
+        import zipfile
+        import zlib
+        try:
+            index = DoxygenIndex.from_archive(path, compound_filter)
+        except (tarfile.TarError, zipfile.BadZipFile, zlib.error, lzma.LZMAError,
+                EOFError, OSError) as exc:
+            raise ExtensionError(
+                '[sphinxcontrib-autodoc_doxygen] Cannot read doxygen archive '
+                'doxygen_xml="%s": %s' % (path, exc))
+        if len(index) == 0:
+            raise err
+        return index
+
+    if not os.path.isdir(path):
         raise err
 
-    files = [os.path.join(app.config.doxygen_xml, f)
-             for f in os.listdir(app.config.doxygen_xml)
+    files = [os.path.join(path, f)
+             for f in os.listdir(path)
              if f.lower().endswith('.xml') and not f.startswith('._')]
     if len(files) == 0:
         raise err
 
-    setup.DOXYGEN_ROOT = ET.ElementTree(ET.Element('root')).getroot()
-    for file in files:
-        root = ET.parse(file).getroot()
-        for node in root:
-            setup.DOXYGEN_ROOT.append(node)
+    if watch:
+        key = (os.path.abspath(path), compound_filter and compound_filter.key)
+        watcher = _watchers.setdefault(key, DoxygenXmlWatcher(compound_filter))
+        return watcher.load(files)
+    return DoxygenIndex.from_files(files, compound_filter)
+
+
+def get_doxygen_index():
+    """Get the index of the loaded doxygen XML corpus.
+
+    If `setup.DOXYGEN_ROOT` has been set to an element directly, the
+    index is built from that element instead.
+    """
+    root = getattr(setup, 'DOXYGEN_ROOT', None)
+    index = getattr(setup, 'DOXYGEN_INDEX', None)
+    if root is not None and (index is None or index.root is not root):
+        from .index import DoxygenIndex
+        index = setup.DOXYGEN_INDEX = DoxygenIndex.from_root(root)
+    elif index is None:
+        from lxml import etree as ET
+        from .index import DoxygenIndex
+        index = setup.DOXYGEN_INDEX = DoxygenIndex.from_root(ET.Element("root"))  # dummy
+    return index
 
 
 def get_doxygen_root():
     """Get the root element of the doxygen XML document.
+
+    This materializes the whole corpus; prefer the lookups of
+    `get_doxygen_index()`.
+    """
+    if hasattr(setup, 'DOXYGEN_ROOT'):
+        return setup.DOXYGEN_ROOT
+    return get_doxygen_index().getroot()
+
+
+def process_generate_options(app):
+    """Generate the autosummary stubs, importing the stub generator only
+    if there is anything to generate.
     """
-    if not hasattr(setup, 'DOXYGEN_ROOT'):
-        setup.DOXYGEN_ROOT = ET.Element("root")  # dummy
-    return setup.DOXYGEN_ROOT
+    if not app.config.autosummary_generate:
+        return
+    from .autosummary.generate import process_generate_options
+    process_generate_options(app)
 
 
 def setup(app):
@@ -41,10 +149,15 @@ def setup(app):
     from .autodoc import DoxygenModuleDocumenter, DoxygenMethodDocumenter, \
         DoxygenTypeDocumenter
     from .autosummary import DoxygenAutosummary, DoxygenAutoEnum
-    from .autosummary.generate import process_generate_options
+    from .envdata import report_size
+    from .images import sync_images
+    from .readorder import order_docs
 
     app.connect("builder-inited", set_doxygen_xml)
+    app.connect("builder-inited", sync_images)
     app.connect("builder-inited", process_generate_options)
+    app.connect("env-before-read-docs", order_docs)
+    app.connect("build-finished", report_size)
 
     app.setup_extension('sphinx.ext.autodoc')
     app.setup_extension('sphinx.ext.autosummary')
@@ -53,9 +166,19 @@ def setup(app):
     app.add_autodocumenter(DoxygenMethodDocumenter)
     app.add_autodocumenter(DoxygenTypeDocumenter)
     app.add_config_value("doxygen_xml", "", 'env')
+    app.add_config_value("doxygen_tagfile", "", 'env')
+    app.add_config_value("doxygen_xml_watch", False, '')
+    app.add_config_value("doxygen_image_dir", "", 'env')
+    app.add_config_value("doxygen_include_kinds", [], 'env')
+    app.add_config_value("doxygen_exclude_kinds", [], 'env')
+    app.add_config_value("doxygen_include_names", [], 'env')
+    app.add_config_value("doxygen_exclude_names", [], 'env')
+    app.add_config_value("doxygen_exclude_prot", [], 'env')
     app.add_config_value('autosummary_toctree', '', 'html')
+    app.add_config_value('doxygen_module_split', 0, 'env')
 
     app.add_directive('autodoxysummary', DoxygenAutosummary)
     app.add_directive('autodoxyenum', DoxygenAutoEnum)
 
-    return {'version': sphinx.__display_version__, 'parallel_read_safe': True}
+    return {'version': sphinx.__display_version__, 'parallel_read_safe': True,
+            'parallel_write_safe': True}
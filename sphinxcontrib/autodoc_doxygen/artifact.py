@@ -0,0 +1,127 @@
+"""Compile a doxygen XML directory into a single artifact file.
+
+Several Sphinx projects built from the same doxygen output can point
+``doxygen_xml`` at the artifact instead of the XML directory: loading it
+is a single read, with no XML parsing and with the descriptions already
+formatted.
+
+The file starts with a fixed header (magic, format version, length and
+sha256 of the payload), followed by the pickled `DoxygenIndex`.
+"""
+from __future__ import print_function, absolute_import, division
+
+import argparse
+import hashlib
+import os
+import pickle
+import struct
+import sys
+
+from sphinx.errors import ExtensionError
+
+MAGIC = b'SPHXDOXY'
+VERSION = 6
+
+# magic, format version, payload length, sha256 of the payload
+_HEADER = struct.Struct('>8sIQ32s')
+
+
+def is_artifact(filename):
+    """Whether *filename* is a file that starts like an artifact."""
+    if not os.path.isfile(filename):
+        return False
+    with open(filename, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def write_artifact(index, filename):
+    """Write the doxygen *index* to the artifact *filename*."""
+    payload = pickle.dumps(index, pickle.HIGHEST_PROTOCOL)
+    header = _HEADER.pack(MAGIC, VERSION, len(payload),
+                          hashlib.sha256(payload).digest())
+
+    tmpname = '%s.%d.tmp' % (filename, os.getpid())
+    with open(tmpname, 'wb') as f:
+        f.write(header)
+        f.write(payload)
+    os.replace(tmpname, filename)
+
+
+def read_artifact(filename):
+    """Read the doxygen index back from the artifact *filename*.
+
+    Raises `ExtensionError` if the file is not an artifact, was written
+    by an incompatible version, or is damaged.
+
+    The payload is a pickle, and unpickling it can run arbitrary code:
+    only load artifacts from a trusted source. The sha256 in the header
+    only detects accidental corruption, since anyone who can write the
+    file can write a matching digest.
+    """
+    with open(filename, 'rb') as f:
+        data = f.read()
+
+    def error(reason):
+        return ExtensionError(
+            '[sphinxcontrib-autodoc_doxygen] Cannot load doxygen artifact '
+            '"%s": %s' % (filename, reason))
+
+    if len(data) < _HEADER.size:
+        raise error('file is truncated')
+    magic, version, length, digest = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise error('not an artifact file')
+    if version != VERSION:
+        raise error('format version %d, expected %d; please recompile it'
+                    % (version, VERSION))
+
+    payload = data[_HEADER.size:]
+    if len(payload) != length or hashlib.sha256(payload).digest() != digest:
+        raise error('checksum mismatch')
+    return pickle.loads(payload)
+
+
+def compile_artifact(doxygen_xml, filename):
+    """Load the doxygen XML directory *doxygen_xml*, format all of its
+    descriptions and write everything to the artifact *filename*.
+    """
+    from . import load_doxygen_index
+
+    index = load_doxygen_index(doxygen_xml)
+    index.prerender_descriptions()
+    write_artifact(index, filename)
+    return index
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        usage='%(prog)s [OPTIONS] <DOXYGEN_XML> <OUTPUT_FILE>',
+        epilog='Point the doxygen_xml setting of conf.py at the output file '
+               'to use it.',
+        description="""
+Compile a directory of doxygen XML output into a single artifact file,
+which can be loaded quickly by several Sphinx projects.
+""")
+
+    parser.add_argument('doxygen_xml', metavar='DOXYGEN_XML',
+                        help='directory (or archive) of doxygen XML output')
+    parser.add_argument('output', metavar='OUTPUT_FILE',
+                        help='artifact file to write')
+    return parser
+
+
+def main(argv=sys.argv[1:]):
+    args = get_parser().parse_args(argv)
+
+    try:
+        index = compile_artifact(args.doxygen_xml, args.output)
+    except ExtensionError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+
+    print('[doxygen] wrote %d elements to %s' % (len(index), args.output))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,13 +3,21 @@ from __future__ import print_function, absolute_import, division
 import re
 
 from docutils.parsers.rst import directives
-from six import itervalues
 from lxml import etree as ET
 from sphinx.ext.autodoc import Documenter, members_option, ALL
 from sphinx.errors import ExtensionError
 
-from . import get_doxygen_root
-from .xmlutils import format_xml_paragraph, flatten
+from . import get_doxygen_index
+from .index import read_type_fields
+from .xmlutils import format_description, iter_description, first_paragraph
+
+
+def _is_descendant(node, ancestor):
+    while node is not None:
+        if node is ancestor:
+            return True
+        node = node.getparent()
+    return False
 
 
 class DoxygenDocumenter(Documenter):
@@ -81,7 +89,7 @@ class DoxygenDocumenter(Documenter):
         # document non-skipped members
         memberdocumenters = []
         for (mname, member, isattr) in self.filter_members(members, want_all):
-            classes = [cls for cls in itervalues(self.env.app.registry.documenters)
+            classes = [cls for cls in self.env.app.registry.documenters.values()
                        if cls.can_document_member(member, mname, isattr, self)]
             if not classes:
                 # don't know how to document this member
@@ -104,6 +112,13 @@ class DoxygenDocumenter(Documenter):
         self.env.temp_data['autodoc:module'] = None
         self.env.temp_data['autodoc:class'] = None
 
+    def get_summary(self):
+        """Get the lines of the first paragraph of the brief description,
+        for a row of an autodoxysummary table. The description is only
+        formatted up to the end of that paragraph.
+        """
+        return first_paragraph(iter_description(self.object, 'briefdescription'))
+
 
 class DoxygenModuleDocumenter(DoxygenDocumenter):
     objtype = 'doxymodule'
@@ -113,8 +128,9 @@ class DoxygenModuleDocumenter(DoxygenDocumenter):
 
     option_spec = {
         'members': members_option,
-        'methods': directives.flag,
-        'types': directives.flag,
+        'methods': directives.unchanged,
+        'types': directives.unchanged,
+        'part': directives.flag,
     }
 
     @classmethod
@@ -133,11 +149,10 @@ class DoxygenModuleDocumenter(DoxygenDocumenter):
 
         Returns True if successful, False if an error occurred.
         """
-        xpath_query = './compounddef/compoundname[text()="%s"]/..' % self.fullname
-        match = get_doxygen_root().xpath(xpath_query)
+        match = get_doxygen_index().compounds_by_name(self.fullname)
         if len(match) != 1:
-            raise ExtensionError('[autodoc_doxygen] could not find module (fullname="%s"). I tried'
-                                 'the following xpath: "%s"' % (self.fullname, xpath_query))
+            raise ExtensionError('[autodoc_doxygen] could not find module (fullname="%s"), '
+                                 'found %d matches' % (self.fullname, len(match)))
 
         self.object = match[0]
         return True
@@ -150,15 +165,16 @@ class DoxygenModuleDocumenter(DoxygenDocumenter):
 
     def get_doc(self):
         if self.brief:
-            description = self.object.find('briefdescription')
+            tag = 'briefdescription'
         else:
-            description = self.object.find('detaileddescription')
+            tag = 'detaileddescription'
+            description = self.object.find(tag)
             # use the brief description if there's no content in the
             # detailed description
             if not len(description) and not description.text.strip():
-                description = self.object.find('briefdescription')
+                tag = 'briefdescription'
 
-        doc = [format_xml_paragraph(description)]
+        doc = [format_description(self.object, tag)]
 
         if not any(len(d.strip()) for d in doc[0]):
             doc.append(['<undocumented>', ''])
@@ -169,6 +185,9 @@ class DoxygenModuleDocumenter(DoxygenDocumenter):
 
         return doc
 
+    def get_summary(self):
+        return super().get_summary() or ['<undocumented>', '']
+
     def get_object_members(self, want_all):
         pass
 
@@ -184,20 +203,35 @@ class DoxygenModuleDocumenter(DoxygenDocumenter):
                 'or @kind="public-static-func"]/memberdef[@kind="function"]')
 
             members = [(m.find('name').text, m) for m in all_members]
+            selected = self.selected_members('methods')
+            if selected is not None:
+                members = [(name, m) for name, m in members if name in selected]
 
         elif member_type == 'type':
+            index = get_doxygen_index()
             classes = self.object.findall('./innerclass')
             members = []
             for c in classes:
-
-                class_obj = get_doxygen_root().find('./compounddef[@id="%s"]' % c.get('refid'))
-                if class_obj.get('kind') == 'type':
+                if index.compound_kind(c.get('refid')) == 'type':
+                    class_obj = index.compound(c.get('refid'))
                     members.append((class_obj.find('compoundname').text, class_obj))
+            selected = self.selected_members('types')
+            if selected is not None:
+                members = [(name, c) for name, c in members if name in selected]
 
         super().document_members(all_members=members)
         # Uncomment to view the generated rst for the class.
         # print('\n'.join(self.directive.result))
 
+    def selected_members(self, option):
+        """Get the set of names given to the :types: or :methods: option, or
+        None if all of them should be documented.
+        """
+        names = self.options.get(option)
+        if not names:
+            return None
+        return set(name.strip() for name in names.split(','))
+
     def add_title(self, title, char='='):
         sourcename = self.get_sourcename()
 
@@ -226,6 +260,13 @@ class DoxygenModuleDocumenter(DoxygenDocumenter):
 
         sourcename = self.get_sourcename()
 
+        if 'part' in self.options:
+            # only the selected members, on a subpage of the module page
+            self.add_line(u'.. f:currentmodule:: %s' % self.format_name(), sourcename)
+            self.add_line(u'', sourcename)
+            self.generate_members(all_members)
+            return
+
         # add title
         title = '%s module reference' % self.format_name()
         self.add_title(title, char='=')
@@ -246,6 +287,9 @@ class DoxygenModuleDocumenter(DoxygenDocumenter):
         self.brief = False
         self.add_content(None)
 
+        self.generate_members(all_members)
+
+    def generate_members(self, all_members=False):
         if 'types' in self.options:
             self.add_title('Type Documentation', char='-')
             self.document_members('type', all_members)
@@ -261,6 +305,7 @@ class DoxygenMethodDocumenter(DoxygenDocumenter):
     directivetype = 'function'
     domain = 'f'
     priority = 100
+    typefield = None  # precomputed by parse_id()
 
     @classmethod
     def can_document_member(cls, member, membername, isattr, parent):
@@ -283,19 +328,25 @@ class DoxygenMethodDocumenter(DoxygenDocumenter):
                       sourcename)
 
     def parse_id(self, id):
-        # try to search our parent node instead of the entire tree
-        parent = self.parent
-        if parent is None:
-            parent = get_doxygen_root()
-
-        xp = './/*[@id="%s"]' % id
-        match = parent.xpath(xp)
-        if len(match) > 0:
-            match = match[0]
-            self.fullname = match.find('./definition').text.split()[-1]
+        index = get_doxygen_index()
+        match = index.find_id(id)
+        if self.parent is not None and (match is None or not _is_descendant(match, self.parent)):
+            # the parent isn't part of the index: search it instead
+            match = self.parent.xpath('.//*[@id=$id]', id=id)
+            match = match[0] if len(match) > 0 else None
+            fullname = typefield = None
+        else:
+            fullname = index.member_fullname(id)
+            typefield = index.member_typefield(id)
+        if match is not None:
+            if fullname is None:
+                definition = match.find('./definition').text.split()
+                fullname, typefield = definition[-1], ' '.join(definition[:-1])
+            self.fullname = fullname
             self.modname = self.fullname
             self.objname = match.find('./name').text
             self.object = match
+            self.typefield = typefield
         return False
 
     def import_object(self):
@@ -308,10 +359,10 @@ class DoxygenMethodDocumenter(DoxygenDocumenter):
         return False
 
     def get_doc(self):
-        doc = [format_xml_paragraph(self.object.find('briefdescription'))]
+        doc = [format_description(self.object, 'briefdescription')]
         # add parameter documentation (in detaileddescription) for main function documentation
         if not self.brief:
-            doc += [format_xml_paragraph(self.object.find('detaileddescription'))]
+            doc += [format_description(self.object, 'detaileddescription')]
 
             # add references/referencedby
             references = self.object.findall('references')
@@ -326,6 +377,8 @@ class DoxygenMethodDocumenter(DoxygenDocumenter):
         return doc
 
     def get_typefield(self):
+        if self.typefield is not None:
+            return self.typefield
         return ' '.join(self.object.find('definition').text.split()[:-1])
 
     def format_name(self):
@@ -380,7 +433,7 @@ class DoxygenTypeDocumenter(DoxygenDocumenter):
         return False
 
     def parse_id(self, id):
-        self.object = get_doxygen_root().find('./compounddef[@id="%s"]' % id)
+        self.object = get_doxygen_index().compound(id)
         self.fullname = self.object.find('compoundname').text
         self.modname, self.objname = self.fullname.rsplit('::')
 
@@ -400,32 +453,22 @@ class DoxygenTypeDocumenter(DoxygenDocumenter):
                       sourcename)
 
     def get_doc(self):
-        desc = [format_xml_paragraph(self.object.find('briefdescription'))]
-
-        for member in self.object.findall('./sectiondef/memberdef'):
-            attribs = flatten(member.find('type')).strip().split(', ')
-            name = member.find('name').text
-            shape = ''
-            rest = ''
-
-            # very rudimentary parsing of type attributes
-            # into the Fortran domain format
-            for word in attribs:
-                if word.startswith('dimension'):
-                    shape = word[len('dimension'):].replace(':', r'\:')
-
-            extras = [w for w in attribs[1:] if not w.startswith('dimension')]
-            if member.get('prot') == 'private':
-                extras.append('private')
-            if len(extras):
-                rest = ' [' + ', '.join(extras) + ']'
+        desc = [format_description(self.object, 'briefdescription')]
 
-            field = ':typefield %s%s %s%s:' % (attribs[0], shape, name, rest)
+        fields = get_doxygen_index().type_fields(self.object.get('id'))
+        if fields is None:
+            fields = read_type_fields(self.object)
+
+        # into the Fortran domain format
+        for name, base, shape, attributes, private, brief in fields:
+            extras = list(attributes)
+            if private:
+                extras.append('private')
+            rest = ' [' + ', '.join(extras) + ']' if extras else ''
 
-            # look for the brief description paragraph
-            brief = member.find('briefdescription/para')
+            field = ':typefield %s%s %s%s:' % (base, shape.replace(':', r'\:'), name, rest)
             if brief is not None:
-                field += ' ' + brief.text
+                field += ' ' + brief
 
             desc.append([field])
 
@@ -1,9 +1,7 @@
 from __future__ import print_function, absolute_import, division
 
 import re
-import operator
-from functools import reduce
-from itertools import count, groupby
+import weakref
 
 from docutils import nodes
 from docutils.parsers.rst import directives
@@ -11,18 +9,17 @@ from docutils.statemachine import StringList, ViewList
 from sphinx import addnodes
 from sphinx.ext.autosummary import Autosummary, autosummary_table
 
-from .. import get_doxygen_root
+from .. import get_doxygen_index
 from ..autodoc import DoxygenMethodDocumenter, DoxygenModuleDocumenter
-from ..xmlutils import format_xml_paragraph
+from ..xmlutils import format_xml_paragraph, first_paragraph
 
 
-def import_by_name(name, env=None, prefixes=None, i=0):
-    """Get xml documentation for a class/method with a given name.
-    If there are multiple classes or methods with that name, you
-    can use the `i` kwarg to pick which one.
-    """
-    if prefixes is None:
-        prefixes = [None]
+# doxygen index -> set of (prefixed name, i) that could not be imported
+_failed_imports = weakref.WeakKeyDictionary()
+
+
+def _get_prefixes(env=None, prefixes=None):
+    prefixes = [None] if prefixes is None else list(prefixes)
 
     if env is not None:
         parents = env.ref_context.get('cpp:parent_key')
@@ -30,38 +27,81 @@ def import_by_name(name, env=None, prefixes=None, i=0):
             parent_symbols = [p[0].get_display_string() for p in parents]
             prefixes.append('::'.join(parent_symbols))
 
+    return prefixes
+
+
+def _import_with_prefixes(name, prefixes, i, failed):
     tried = []
 
     for prefix in prefixes:
+        if prefix:
+            prefixed_name = '::'.join([prefix, name])
+        else:
+            prefixed_name = name
+        if (prefixed_name, i) not in failed:
+            try:
+                return _import_by_name(prefixed_name, i=i)
+            except ImportError:
+                failed.add((prefixed_name, i))
+        tried.append(prefixed_name)
+    raise ImportError('no module named %s' % ' or '.join(tried))
+
+
+def import_by_name(name, env=None, prefixes=None, i=0):
+    """Get xml documentation for a class/method with a given name.
+    If there are multiple classes or methods with that name, you
+    can use the `i` kwarg to pick which one.
+    """
+    failed = _failed_imports.setdefault(get_doxygen_index(), set())
+    return _import_with_prefixes(name, _get_prefixes(env, prefixes), i, failed)
+
+
+def import_by_names(names, env=None, prefixes=None):
+    """Get xml documentation for a whole list of names at once.
+
+    A name repeated on consecutive lines refers to the next overload of
+    that name each time, and a leading ``~`` is ignored. Returns a list
+    with, for each name, what `import_by_name` would return, or None if
+    the name could not be imported.
+    """
+    prefixes = _get_prefixes(env, prefixes)
+    failed = _failed_imports.setdefault(get_doxygen_index(), set())
+
+    results = []
+    previous, i = None, 0
+    for name in names:
+        i = i + 1 if name == previous else 0
+        previous = name
+        if name.startswith('~'):
+            name = name[1:]
         try:
-            if prefix:
-                prefixed_name = '::'.join([prefix, name])
-            else:
-                prefixed_name = name
-            return _import_by_name(prefixed_name, i=i)
+            results.append(_import_with_prefixes(name, prefixes, i, failed))
         except ImportError:
-            tried.append(prefixed_name)
-    raise ImportError('no module named %s' % ' or '.join(tried))
+            results.append(None)
+    return results
 
 
 def _import_by_name(name, i=0):
-    root = get_doxygen_root()
+    index = get_doxygen_index()
     name = name.replace('.', '::')
 
+    if not index.has_name(name):
+        # don't even parse anything for names that aren't in the corpus
+        raise ImportError()
+
     if '::' in name:
-        xpath_query = (
-            './compounddef/compoundname[text()="%s"]/../'
-            'sectiondef[@kind="func"]/memberdef[@kind="function"]/'
-            'name[text()="%s"]/..') % tuple(name.rsplit('::', 1))
-        m = root.xpath(xpath_query)
-        if len(m) > 0:
+        compound_name, member_name = name.rsplit('::', 1)
+        m = [member for compound in index.compounds_by_name(compound_name)
+             for member in compound.xpath(
+                 './sectiondef[@kind="func"]/memberdef[@kind="function"]'
+                 '[name=$name]', name=member_name)]
+        if len(m) > i:
             obj = m[i]
             full_name = '.'.join(name.rsplit('::', 1))
             return full_name, obj, full_name, ''
 
-    xpath_query = ('./compounddef/compoundname[text()="%s"]/..' % name)
-    m = root.xpath(xpath_query)
-    if len(m) > 0:
+    m = index.compounds_by_name(name)
+    if len(m) > i:
         obj = m[i]
         return (name, obj, name, '')
 
@@ -99,24 +139,19 @@ class DoxygenAutosummary(Autosummary):
             if self.options['kind'] == 'page':
                 return []
 
-            modules = get_doxygen_root().xpath('./compound[@kind="namespace"]')
-            names = [m.find('name').text for m in modules]
+            names = get_doxygen_index().compounds_of_kind('namespace')
 
-        names_and_counts = reduce(operator.add,
-            [tuple(zip(g, count())) for _, g in groupby(names)]) # type: List[(Str, Int)]
-
-        for name, i in names_and_counts:
+        for name, imported in zip(names, import_by_names(names, env=env)):
             display_name = name
             if name.startswith('~'):
                 name = name[1:]
                 display_name = name.split('::')[-1]
 
-            try:
-                real_name, obj, parent, modname = import_by_name(name, env=env, i=i)
-            except ImportError:
+            if imported is None:
                 self.warn('failed to import %s' % name)
                 items.append((name, '', '', name))
                 continue
+            real_name, obj, parent, modname = imported
 
             self.bridge.result = StringList()  # initialize for each documenter
             documenter = get_documenter(obj, parent)(self, real_name, id=obj.get('id'),
@@ -135,19 +170,10 @@ class DoxygenAutosummary(Autosummary):
             sig = documenter.format_signature()
 
             # -- Grab the summary
-            documenter.add_content(None)
-            doc = list(documenter.process_doc([self.bridge.result.data]))
-
-            while doc and not doc[0].strip():
-                doc.pop(0)
-
             # If there's a blank line, then we can assume the first sentence /
             # paragraph has ended, so anything after shouldn't be part of the
             # summary
-            for i, piece in enumerate(doc):
-                if not piece.strip():
-                    doc = doc[:i]
-                    break
+            doc = first_paragraph(documenter.process_doc([documenter.get_summary()]))[:-1]
 
             # Try to find the "first sentence", which may span multiple lines
             m = re.search(r"^([A-Z].*?\.)(?:\s|$)", " ".join(doc).strip())
@@ -214,9 +240,12 @@ class DoxygenAutoEnum(DoxygenAutosummary):
         self.name = names[0]
 
         real_name, obj, parent, modname = import_by_name(self.name, env=env)
-        names = [n.text for n in obj.findall('./enumvalue/name')]
-        descriptions = [format_xml_paragraph(d) for d in obj.findall('./enumvalue/detaileddescription')]
-        return zip(names, descriptions)
+        values = get_doxygen_index().enum_values(obj.get('id'))
+        if values is None:
+            names = [n.text for n in obj.findall('./enumvalue/name')]
+            descriptions = [format_xml_paragraph(d) for d in obj.findall('./enumvalue/detaileddescription')]
+            return zip(names, descriptions)
+        return [(name, list(description)) for name, description in values]
 
     def get_table(self, items):
         table, table_spec, append_row = self.get_tablespec()
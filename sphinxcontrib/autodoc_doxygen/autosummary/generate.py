@@ -1,62 +1,196 @@
 from __future__ import print_function, absolute_import, division
 
 import codecs
+import functools
 import os
+import pickle
 import re
 import sys
 import datetime
+import weakref
+from itertools import groupby
 
-from jinja2 import FileSystemLoader
+from jinja2 import FileSystemLoader, FileSystemBytecodeCache
 from jinja2.sandbox import SandboxedEnvironment
-from sphinx.jinja2glue import BuiltinTemplateLoader
+from sphinx.errors import ExtensionError
 from sphinx.util.osutil import ensuredir
 
-from . import import_by_name, get_doxygen_root
-from ..xmlutils import format_xml_paragraph
+from . import import_by_name, get_doxygen_index
+from .. import load_doxygen_index
+from ..xmlutils import format_description
 
 def is_type(node):
-    def_node = get_doxygen_root().find('./compounddef[@id="%s"]' % node.get('refid'))
-    return def_node.get('kind') == 'type'
+    return get_doxygen_index().compound_kind(node.get('refid')) == 'type'
+
+
+
+class StubRenderer(object):
+    """Long-lived templating environment for the autosummary stubs.
+
+    Each template is resolved and compiled only once per renderer, and if
+    *cache_dir* is given the compiled bytecode is kept there, so later
+    builds don't even have to compile them.
+    """
+
+    def __init__(self, builder=None, template_dir=None, cache_dir=None):
+        template_dirs = [os.path.join(os.path.dirname(__file__), 'templates')]
+
+        if builder is not None:
+            # allow the user to override the templates
+            from sphinx.jinja2glue import BuiltinTemplateLoader
+            template_loader = BuiltinTemplateLoader()
+            template_loader.init(builder, dirs=template_dirs)
+        else:
+            if template_dir:
+                template_dirs.insert(0, template_dir)
+            template_loader = FileSystemLoader(template_dirs)
+
+        bytecode_cache = None
+        if cache_dir is not None:
+            ensuredir(cache_dir)
+            bytecode_cache = FileSystemBytecodeCache(cache_dir)
+
+        self.env = SandboxedEnvironment(loader=template_loader, bytecode_cache=bytecode_cache,
+                                        trim_blocks=True, lstrip_blocks=True)
+        self.templates = {}
+
+    def get_template(self, template_name):
+        template = self.templates.get(template_name)
+        if template is None:
+            template = self.templates[template_name] = self.env.get_template(template_name)
+        return template
+
+    def render(self, template_name, ns):
+        return self.get_template(template_name).render(ns)
+
+    def render_many(self, template_name, namespaces):
+        """Render *template_name* once for each of *namespaces*, returning
+        a list of the rendered strings.
+        """
+        render = self.get_template(template_name).render
+        return [render(ns) for ns in namespaces]
+
+
+_renderers = weakref.WeakKeyDictionary()  # builder -> {(template_dir, cache_dir): renderer}
+_plain_renderers = {}                     # (template_dir, cache_dir) -> renderer
+
+
+def get_stub_renderer(builder=None, template_dir=None, cache_dir=None):
+    """Get the `StubRenderer` for *builder* (or for *template_dir*, when
+    there is no builder), creating it on first use.
+    """
+    if builder is not None:
+        renderers = _renderers.setdefault(builder, {})
+    else:
+        renderers = _plain_renderers
+
+    key = (template_dir, cache_dir)
+    if key not in renderers:
+        renderers[key] = StubRenderer(builder, template_dir, cache_dir)
+    return renderers[key]
+
+
+def _simple_info(msg):
+    print(msg)
+
 
 def generate_autosummary_docs(sources, output_dir=None, suffix='.rst',
                               base_path=None, builder=None, template_dir=None,
-                              toctree=None):
-
+                              toctree=None, scan_cache=None, template_cache_dir=None,
+                              overwrite=False, dry_run=False, jobs=1, split=0,
+                              info=_simple_info, return_namespaces=False):
+    """Generate the stubs for all the items of the autodoxysummary
+    directives in *sources*, and in the stubs generated for them.
+
+    Existing stubs are left alone, unless *overwrite* is set, in which case
+    they are rewritten if their content changed. With *dry_run* nothing is
+    written at all. With *jobs* > 1 the stubs are rendered by a pool of
+    forked worker processes (ignored when there is a *builder*, or where
+    processes can't be forked).
+
+    If *split* is set, namespaces/modules with more than *split* types and
+    procedures get them documented on subpages of at most *split* members
+    each, listed in a toctree of the module page.
+
+    Progress messages are passed to *info*.
+
+    Returns a dict mapping the filename of each stub considered to
+    ``'created'``, ``'updated'`` or ``'unchanged'``. With
+    *return_namespaces*, returns ``(status, namespaces)`` instead, where
+    *namespaces* is a list of ``(filename, namespace)`` with the template
+    namespace each stub is rendered from (None for stubs without a
+    template).
+    """
     showed_sources = list(sorted(sources))
     if len(showed_sources) > 20:
         showed_sources = showed_sources[:10] + ['...'] + showed_sources[-10:]
-    print('[autosummary] generating autosummary for: %s' %
-          ', '.join(showed_sources))
+    info('[autosummary] generating autosummary for: %s' %
+         ', '.join(showed_sources))
 
     if output_dir:
-        print('[autosummary] writing to %s' % output_dir)
+        info('[autosummary] writing to %s' % output_dir)
 
     if base_path is not None:
         sources = [os.path.join(base_path, filename) for filename in sources]
 
-    # create our own templating environment
-    template_dirs = [os.path.join(os.path.dirname(__file__), 'templates')]
-
-    if builder is not None:
-        # allow the user to override the templates
-        template_loader = BuiltinTemplateLoader()
-        template_loader.init(builder, dirs=template_dirs)
+    if not isinstance(scan_cache, AutosummaryScanCache):
+        scan_cache = AutosummaryScanCache(scan_cache)
+
+    pool = None
+    if jobs > 1 and builder is None:
+        import multiprocessing
+        if 'fork' in multiprocessing.get_all_start_methods():
+            # the workers share the doxygen index with us
+            pool = multiprocessing.get_context('fork').Pool(jobs)
+    if pool is not None:
+        render = functools.partial(_render_stubs_in_pool, pool, jobs,
+                                   (template_dir, template_cache_dir, dry_run, split))
     else:
-        if template_dir:
-            template_dirs.insert(0, template_dir)
-        template_loader = FileSystemLoader(template_dirs)
-    template_env = SandboxedEnvironment(loader=template_loader,
-                                        trim_blocks=True, lstrip_blocks=True)
-
-    # read
-    items = find_autosummary_in_files(sources)
-
-    # keep track of new files
-    new_files = []
-
+        renderer = get_stub_renderer(builder, template_dir, template_cache_dir)
+        render = functools.partial(_render_stubs, renderer=renderer, dry_run=dry_run,
+                                   split=split)
+
+    # Work through the sources, then through every stub generated along the
+    # way (which may contain autodoxysummary directives of their own), until
+    # no new stubs appear. Each item is only handled once in the whole
+    # closure.
+    done = set()
+    status = {}
+    namespaces = []
+    items = find_autosummary_in_files(sources, cache=scan_cache)
+    try:
+        while items:
+            stubs = _generate_stubs(items, done, output_dir, suffix, toctree, overwrite)
+            items = []
+            for fn, stub_status, entries, ns in render(stubs):
+                status[fn] = stub_status
+                namespaces.append((fn, ns))
+                items.extend(_expand_entries(entries, scan_cache.expand))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    scan_cache.save()
+
+    if return_namespaces:
+        return status, namespaces
+    return status
+
+
+def _generate_stubs(items, done, output_dir, suffix, toctree, overwrite=False):
+    """Work out which stubs to generate for *items* that are not in *done*
+    yet, returning a list of ``(template_name, filename, name)``.
+    """
+    stubs = []
+    pending = set()
     for name, path, template_name in sorted(set(items), key=str):
+        if not path and not output_dir and toctree is None:
+            # nowhere to write it to
+            continue
         path = path or output_dir or os.path.abspath(toctree)
-        ensuredir(path)
+        if (name, path, template_name) in done:
+            continue
+        done.add((name, path, template_name))
 
         try:
             name, obj, parent, mod_name = import_by_name(name)
@@ -66,10 +200,10 @@ def generate_autosummary_docs(sources, output_dir=None, suffix='.rst',
 
         fn = os.path.join(path, name + suffix).replace('::', '.')
 
-        # skip it if it exists
-        if os.path.isfile(fn):
+        # skip it if it exists, or another item is already going to write it
+        if fn in pending or (not overwrite and os.path.isfile(fn)):
             continue
-
+        pending.add(fn)
 
         if template_name is None:
             if obj.tag == 'compounddef' and obj.get('kind') == 'class':
@@ -78,60 +212,245 @@ def generate_autosummary_docs(sources, output_dir=None, suffix='.rst',
                 template_name = 'doxynamespace.rst'
             elif obj.tag == 'compounddef' and obj.get('kind') == 'page':
                 template_name = 'doxypage.rst'
+            elif obj.tag == 'memberdef' or obj.get('kind') == 'type':
+                # documented on the page of the compound they belong to
+                continue
             else:
                 raise NotImplementedError('No template for %s (%s)' % (obj, obj.get('kind')))
 
-        with open(fn, 'w') as f:
-            template = template_env.get_template(template_name)
-            ns = {}
-            if obj.tag == 'compounddef' and obj.get('kind') == 'class':
-                ns['methods'] = [e.text for e in obj.findall('.//sectiondef[@kind="public-func"]/memberdef[@kind="function"]/name')]
-                ns['enums'] = [e.text for e in obj.findall('.//sectiondef[@kind="public-type"]/memberdef[@kind="enum"]/name')]
-                ns['objtype'] = 'class'
-            elif obj.tag == 'compounddef' and obj.get('kind') == 'namespace':
-                ns['methods'] = [e.text for e in obj.findall('./sectiondef[@kind="func"]/memberdef[@kind="function"]/name')]
-                ns['types'] = [e.text for e in obj.findall('./innerclass') if is_type(e)]
-                ns['objtype'] = 'namespace'
-            elif obj.tag == 'compounddef' and obj.get('kind') == 'page':
-                ns['title'] = obj.find('title').text
-                ns['text'] = format_xml_paragraph(obj.find('detaileddescription'))
-            else:
-                continue
-                raise NotImplementedError(obj)
+        stubs.append((template_name, fn, name))
+
+    return stubs
+
+
+def _stub_namespace(name, obj):
+    """Get the template namespace for the stub of *obj*, or None if we
+    don't know how to fill it in.
+    """
+    ns = {}
+    if obj.tag == 'compounddef' and obj.get('kind') == 'class':
+        ns['methods'] = [e.text for e in obj.findall('.//sectiondef[@kind="public-func"]/memberdef[@kind="function"]/name')]
+        ns['enums'] = [e.text for e in obj.findall('.//sectiondef[@kind="public-type"]/memberdef[@kind="enum"]/name')]
+        ns['objtype'] = 'class'
+    elif obj.tag == 'compounddef' and obj.get('kind') == 'namespace':
+        ns['methods'] = [e.text for e in obj.findall('./sectiondef[@kind="func"]/memberdef[@kind="function"]/name')]
+        ns['types'] = [e.text for e in obj.findall('./innerclass') if is_type(e)]
+        ns['objtype'] = 'namespace'
+    elif obj.tag == 'compounddef' and obj.get('kind') == 'page':
+        ns['title'] = obj.find('title').text
+        ns['text'] = format_description(obj)
+    else:
+        return None
+
+    parts = name.split('::')
+    mod_name, obj_name = '::'.join(parts[:-1]), parts[-1]
+
+    ns['fullname'] = name
+    ns['module'] = mod_name
+    ns['objname'] = obj_name
+    ns['name'] = parts[-1]
+    ns['underline'] = len(name) * '='
+    return ns
+
+
+def _split_namespace(fn, ns, split):
+    """Move the types and procedures of the namespace stub *ns* (to be
+    written to *fn*) to parts of at most *split* members each, if there
+    are more than that.
+
+    Sets ``ns['parts']`` to the list of part namespaces, and returns a list
+    of ``(filename, namespace)`` for them.
+    """
+    types, methods = ns.get('types', []), ns.get('methods', [])
+    members = [('types', name) for name in types] + [('methods', name) for name in methods]
+    ns['parts'] = []
+    if not split or len(members) <= split:
+        return []
+
+    base, suffix = os.path.splitext(fn)
+    parts = []
+    for number, start in enumerate(range(0, len(members), split), 1):
+        chunk = members[start:start + split]
+        title = '%s (%d/%d)' % (ns['fullname'], number, (len(members) + split - 1) // split)
+        part = dict(ns, types=[name for kind, name in chunk if kind == 'types'],
+                    methods=[name for kind, name in chunk if kind == 'methods'],
+                    docname=os.path.basename(base) + '-%d' % number,
+                    title=title, underline=len(title) * '=')
+        del part['parts']
+        ns['parts'].append(part)
+        parts.append((base + '-%d' % number + suffix, part))
+    return parts
+
+
+def _render_stubs(stubs, renderer, dry_run=False, split=0):
+    """Render and write *stubs*, as returned by `_generate_stubs`.
+
+    Returns a list of ``(filename, status, entries, namespace)``, with the
+    raw autodoxysummary entries found in each stub and the namespace it was
+    rendered from.
+    """
+    prepared = []  # (template_name, filename, namespace)
+    results = []
+    for template_name, fn, name in stubs:
+        name, obj, parent, mod_name = import_by_name(name)
+        ns = _stub_namespace(name, obj)
+        if ns is None:
+            exists = os.path.isfile(fn)
+            if not exists and not dry_run:
+                ensuredir(os.path.dirname(fn))
+                open(fn, 'w').close()
+            results.append((fn, 'unchanged' if exists else 'created', [], None))
+            continue
+        if ns.get('objtype') == 'namespace':
+            for part_fn, part_ns in _split_namespace(fn, ns, split):
+                prepared.append(('doxynamespace_part.rst', part_fn, part_ns))
+        prepared.append((template_name, fn, ns))
+
+    # render all the stubs sharing a template in one go
+    prepared.sort(key=lambda stub: stub[0])
+    for template_name, group in groupby(prepared, key=lambda stub: stub[0]):
+        group = list(group)
+        rendered = renderer.render_many(template_name, [ns for _, _, ns in group])
+        for (_, fn, ns), text in zip(group, rendered):
+            results.append((fn, _write_stub(fn, text, dry_run),
+                            _scan_autosummary_lines(text.splitlines(), filename=fn), ns))
+
+    return results
 
-            parts = name.split('::')
-            mod_name, obj_name = '::'.join(parts[:-1]), parts[-1]
 
-            ns['fullname'] = name
-            ns['module'] = mod_name
-            ns['objname'] = obj_name
-            ns['name'] = parts[-1]
-            ns['underline'] = len(name) * '='
+def _render_stub_chunk(args):
+    stubs, template_dir, template_cache_dir, dry_run, split = args
+    renderer = get_stub_renderer(None, template_dir, template_cache_dir)
+    return _render_stubs(stubs, renderer, dry_run, split)
 
-            rendered = template.render(**ns)
-            f.write(rendered)
+
+def _render_stubs_in_pool(pool, jobs, options, stubs):
+    chunks = [(stubs[i::jobs],) + options for i in range(jobs) if stubs[i::jobs]]
+    return [result for results in pool.map(_render_stub_chunk, chunks)
+            for result in results]
+
+
+def _write_stub(fn, text, dry_run=False):
+    """Write *text* to the stub *fn*, unless it already has that content,
+    and return whether it was ``'created'``, ``'updated'`` or ``'unchanged'``.
+    """
+    status = 'created'
+    if os.path.isfile(fn):
+        with open(fn) as f:
+            # ignore the timestamp comment at the end
+            head, sep, stamp = f.read().rpartition('\n..\n   ')
+        if sep and head == text and '\n' not in stamp:
+            return 'unchanged'
+        status = 'updated'
+
+    if not dry_run:
+        ensuredir(os.path.dirname(fn))
+        with open(fn, 'w') as f:
+            f.write(text)
             f.write('\n..\n   {}'.format(datetime.datetime.now()))
+    return status
 
-    # descend recursively to new files
-    if new_files:
-        generate_autosummary_docs(new_files, output_dir=output_dir,
-                                  suffix=suffix, base_path=base_path, builder=builder,
-                                  template_dir=template_dir, toctree=toctree)
 
+class AutosummaryScanCache(object):
+    """Persistent cache of the autodoxysummary entries found in each
+    source file, keyed by the file's mtime and size, and of the expanded
+    ``:generate:`` lists, keyed by the signature of the doxygen index.
+    """
+    version = 1
+
+    def __init__(self, filename=None):
+        self.filename = filename
+        self.files = {}       # filename -> (mtime, size, entries)
+        self.signature = None
+        self.expanded = {}    # kind -> names, valid for `signature`
+        self.seen = set()
+        self.dirty = False
+
+        if filename is not None and os.path.isfile(filename):
+            try:
+                with open(filename, 'rb') as f:
+                    version, files, signature, expanded = pickle.load(f)
+            except Exception:
+                # corrupt or from an incompatible version: start afresh
+                return
+            if version == self.version:
+                self.files, self.signature, self.expanded = files, signature, expanded
+
+    def scan(self, filename):
+        """Get the raw entries of *filename*, only re-reading it if it
+        changed since it was last scanned.
+        """
+        st = os.stat(filename)
+        self.seen.add(filename)
+        cached = self.files.get(filename)
+        if cached is not None and cached[:2] == (st.st_mtime_ns, st.st_size):
+            return cached[2]
+
+        entries = _scan_autosummary_file(filename)
+        self.files[filename] = (st.st_mtime_ns, st.st_size, entries)
+        self.dirty = True
+        return entries
+
+    def expand(self, kind):
+        index = get_doxygen_index()
+        if self.signature != index.signature:
+            self.signature = index.signature
+            self.expanded = {}
+        if kind not in self.expanded:
+            self.expanded[kind] = expand_generate_kind(kind)
+            self.dirty = True
+        return self.expanded[kind]
+
+    def save(self):
+        # forget about files that are gone from the project
+        stale = set(self.files) - self.seen
+        for filename in stale:
+            del self.files[filename]
+
+        if self.filename is None or not (self.dirty or stale):
+            return
+
+        ensuredir(os.path.dirname(self.filename))
+        tmpname = self.filename + '.tmp'
+        with open(tmpname, 'wb') as f:
+            pickle.dump((self.version, self.files, self.signature, self.expanded), f,
+                        pickle.HIGHEST_PROTOCOL)
+        os.replace(tmpname, self.filename)
+        self.dirty = False
+
+
+def expand_generate_kind(kind):
+    """Get the names of all objects listed by an autodoxysummary with
+    ``:generate:`` and the given ``:kind:``.
+    """
+    if kind == 'mod':
+        return get_doxygen_index().compounds_of_kind('namespace')
+    elif kind == 'page':
+        return get_doxygen_index().pages
+    return []
 
-def find_autosummary_in_files(filenames):
+
+def find_autosummary_in_files(filenames, cache=None):
     """Find out what items are documented in source/*.rst.
 
+    If *cache* is given, either as an `AutosummaryScanCache` or the
+    filename to keep one in, only the files that changed since the last
+    call are re-read.
+
     See `find_autosummary_in_lines`.
     """
     # todo: break when this doesn't exist
     # look for modules and standalone documentation pages, but *not* the index page
     # itself (which it links to from itself for some reason...)
+    if cache is None:
+        cache = AutosummaryScanCache()
+    elif not isinstance(cache, AutosummaryScanCache):
+        cache = AutosummaryScanCache(cache)
+
     documented = []
     for filename in filenames:
-        with codecs.open(filename, 'r', encoding='utf-8', errors='ignore') as f:
-            lines = f.read().splitlines()
-            documented.extend(find_autosummary_in_lines(lines, filename=filename))
+        documented.extend(_expand_entries(cache.scan(filename), cache.expand))
+    cache.save()
 
     return documented
 
@@ -147,6 +466,30 @@ def find_autosummary_in_lines(lines, module=None, filename=None):
     *template* ``None`` if the directive does not have the
     corresponding options set.
     """
+    return list(_expand_entries(_scan_autosummary_lines(lines, filename=filename),
+                                expand_generate_kind))
+
+
+def _expand_entries(entries, expand):
+    for name, toctree, template, kind in entries:
+        if kind is None:
+            yield (name, toctree, template)
+        else:
+            for name in expand(kind):
+                yield (name, toctree, template)
+
+
+def _scan_autosummary_file(filename):
+    with codecs.open(filename, 'r', encoding='utf-8', errors='ignore') as f:
+        lines = f.read().splitlines()
+    return _scan_autosummary_lines(lines, filename=filename)
+
+
+def _scan_autosummary_lines(lines, filename=None):
+    """Like `find_autosummary_in_lines`, but returns (name, toctree,
+    template, kind) tuples where a ``:generate:`` directive is left
+    unexpanded as a single entry with *name* None and its *kind*.
+    """
     autosummary_re      = re.compile(r'^(\s*)\.\.\s+autodoxysummary::\s*')
     toctree_arg_re      = re.compile(r'^\s+:toctree:\s*(.*?)\s*$')
     template_arg_re     = re.compile(r'^\s+:template:\s*(.*?)\s*$')
@@ -184,18 +527,7 @@ def find_autosummary_in_lines(lines, module=None, filename=None):
 
             m = kind_arg_re.match(line)
             if m and generate:
-                kind = m.group(1).strip()
-                xpath = None
-                if kind == 'mod':
-                    xpath = './compound[@kind="namespace"]'
-                elif kind == 'page':
-                    xpath = './compound[@kind="page" and not(@refid="indexpage")]'
-
-                if xpath is not None:
-                    results = get_doxygen_root().xpath(xpath)
-                    for result in results:
-                        documented.append((result.find('name').text, toctree, template))
-
+                documented.append((None, toctree, template, m.group(1).strip()))
                 continue
 
             if line.strip().startswith(':'):
@@ -206,7 +538,7 @@ def find_autosummary_in_lines(lines, module=None, filename=None):
                 name = m.group(1).strip()
                 if name.startswith('~'):
                     name = name[1:]
-                documented.append((name, toctree, template))
+                documented.append((name, toctree, template, None))
                 continue
 
             if not line.strip() or line.startswith(base_indent + " "):
@@ -242,5 +574,83 @@ def process_generate_options(app):
     genfiles = [genfile + (not genfile.endswith(ext) and ext or '')
                 for genfile in genfiles]
 
+    scan_cache = AutosummaryScanCache(
+        os.path.join(app.doctreedir, 'autodoxysummary-scan.pickle'))
     generate_autosummary_docs(genfiles, builder=app.builder,
-                              suffix=ext, base_path=app.srcdir, toctree=toctree)
+                              suffix=ext, base_path=app.srcdir, toctree=toctree,
+                              scan_cache=scan_cache,
+                              template_cache_dir=os.path.join(app.doctreedir,
+                                                              'autodoxysummary-templates'),
+                              split=app.config.doxygen_module_split)
+
+
+def get_parser():
+    import argparse
+    parser = argparse.ArgumentParser(
+        usage='%(prog)s [OPTIONS] <SOURCE_FILE>...',
+        description="""
+Generate ReStructuredText stubs for the items listed in the autodoxysummary
+directives of the given source files, and of the stubs generated for them,
+without running Sphinx.
+
+This is the same as the stub generation done by the
+sphinxcontrib.autodoc_doxygen extension at the start of a build, so it can
+run as a separate step whose output is reused by several builds.
+""")
+
+    parser.add_argument('source_file', nargs='+',
+                        help='source files to generate rST files for')
+    parser.add_argument('-x', '--doxygen-xml', action='store', dest='doxygen_xml',
+                        required=True,
+                        help='directory (or archive) containing the doxygen XML output')
+    parser.add_argument('--doxygen-tagfile', action='store', dest='doxygen_tagfile',
+                        default='',
+                        help='doxygen tagfile to resolve names from')
+    parser.add_argument('-o', '--output-dir', action='store', dest='output_dir',
+                        help='directory to place the stubs of directives without '
+                             'a :toctree: in')
+    parser.add_argument('-s', '--suffix', action='store', dest='suffix', default='rst',
+                        help='default suffix for files (default: %(default)s)')
+    parser.add_argument('-t', '--templates', action='store', dest='templates',
+                        help='custom template directory (default: %(default)s)')
+    parser.add_argument('-j', '--jobs', action='store', dest='jobs', type=int,
+                        default=1,
+                        help='number of worker processes (default: %(default)s)')
+    parser.add_argument('-n', '--dry-run', action='store_true', dest='dry_run',
+                        help="don't write anything, only report what would change")
+    parser.add_argument('--split', action='store', dest='split', type=int, default=0,
+                        help='document the types and procedures of modules with more '
+                             'than this many of them on subpages (default: never)')
+
+    return parser
+
+
+def main(argv=sys.argv[1:]):
+    args = get_parser().parse_args(argv)
+
+    try:
+        load_doxygen_index(args.doxygen_xml, args.doxygen_tagfile)
+    except ExtensionError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    status = generate_autosummary_docs(args.source_file, args.output_dir,
+                                       '.' + args.suffix,
+                                       template_dir=args.templates,
+                                       overwrite=True, dry_run=args.dry_run,
+                                       jobs=args.jobs, split=args.split)
+
+    prefix = '[autosummary] (dry run) ' if args.dry_run else '[autosummary] '
+    for fn, stub_status in sorted(status.items()):
+        if stub_status != 'unchanged':
+            print('%s%s %s' % (prefix, stub_status, fn))
+
+    counts = dict((s, 0) for s in ('created', 'updated', 'unchanged'))
+    for stub_status in status.values():
+        counts[stub_status] += 1
+    print('%s%d created, %d updated, %d unchanged' % (
+        prefix, counts['created'], counts['updated'], counts['unchanged']))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,47 @@
+"""The data the extension keeps in the Sphinx build environment.
+
+The environment is pickled at the end of every read phase, and loaded
+again at the start of every incremental build, so the extension keeps
+what it can out of it: the doxygen index lives in the process, and no
+per-document data is stored yet. Anything added there goes in an
+attribute of the environment whose name starts with ``doxygen_``, must be
+small and plain (strings, and tuples or sets of them, never elements or
+documenters), and must have ``env-purge-doc`` and ``env-merge-info``
+handlers. `report_size` logs the share of the pickle it takes.
+"""
+from __future__ import print_function, absolute_import, division
+
+import os
+import pickle
+
+from sphinx.util import logging
+
+logger = logging.getLogger(__name__)
+
+# prefix of the names of the env attributes holding the extension's data
+PREFIX = 'doxygen_'
+
+
+def extension_data(env):
+    """Get a ``name -> value`` dict of the extension's data in *env*."""
+    return dict((name, value) for name, value in vars(env).items()
+                if name.startswith(PREFIX))
+
+
+def report_size(app, exception):
+    """Log how much of the pickled environment is the extension's data,
+    if it keeps any there.
+    """
+    if exception is not None:
+        return
+    data = extension_data(app.env)
+    if not data:
+        return
+    filename = os.path.join(app.doctreedir, 'environment.pickle')
+    if not os.path.isfile(filename):
+        return
+
+    total = os.path.getsize(filename)
+    size = len(pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+    logger.info('[autodoc_doxygen] %d of the %d bytes of the environment pickle '
+                '(%.1f%%) are doxygen data', size, total, 100. * size / max(total, 1))
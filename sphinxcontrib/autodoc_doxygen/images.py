@@ -0,0 +1,121 @@
+"""Copy the images referenced by the doxygen descriptions into the source
+tree, where the ``.. image:: /images/<name>`` directives written by the
+formatter look for them.
+
+Only the images the corpus actually references are copied, and only when
+their content changed, so that rebuilding does not touch the files and
+make Sphinx read the documents using them again.
+"""
+from __future__ import print_function, absolute_import, division
+
+import hashlib
+import os
+import pickle
+
+from sphinx.errors import ExtensionError
+from sphinx.util import logging
+
+from . import get_doxygen_index
+
+logger = logging.getLogger(__name__)
+
+# directory of the source tree the images go to, see visit_image
+IMAGES_DIR = 'images'
+
+MANIFEST = 'doxygen_images.pickle'
+
+
+def _stamp(filename):
+    st = os.stat(filename)
+    return st.st_mtime_ns, st.st_size
+
+
+def _digest(filename):
+    with open(filename, 'rb') as f:
+        return hashlib.sha256(f.read()).digest()
+
+
+def _load_manifest(filename):
+    try:
+        with open(filename, 'rb') as f:
+            manifest = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return {}
+    return manifest if isinstance(manifest, dict) else {}
+
+
+def copy_images(names, source, target, manifest=None):
+    """Copy the images *names* from the directory *source* to *target*,
+    unless the copy in *target* already has the same content.
+
+    *manifest*, if given, is a file remembering the stamp and hash of each
+    image between calls, so that images that didn't change are not even
+    read again. Returns the lists of the names that were copied, that
+    were up to date and that are missing from *source*.
+    """
+    known = _load_manifest(manifest) if manifest else {}
+    entries = {}
+    copied, unchanged, missing = [], [], []
+
+    for name in names:
+        if os.path.isabs(name) or os.path.normpath(name).startswith(os.pardir):
+            # not a file doxygen wrote to its output
+            missing.append(name)
+            continue
+        src = os.path.join(source, name)
+        dest = os.path.join(target, name)
+        if not os.path.isfile(src):
+            missing.append(name)
+            continue
+
+        stamp = _stamp(src)
+        entry = known.get(name)
+        if entry is not None and entry[0] == stamp and os.path.isfile(dest) and \
+                _stamp(dest) == entry[2]:
+            entries[name] = entry
+            unchanged.append(name)
+            continue
+
+        with open(src, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).digest()
+        if os.path.isfile(dest) and _digest(dest) == digest:
+            unchanged.append(name)
+        else:
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            tmpname = '%s.%d.tmp' % (dest, os.getpid())
+            with open(tmpname, 'wb') as f:
+                f.write(data)
+            os.replace(tmpname, dest)
+            copied.append(name)
+        entries[name] = (stamp, digest, _stamp(dest))
+
+    if manifest:
+        with open(manifest, 'wb') as f:
+            pickle.dump(entries, f, pickle.HIGHEST_PROTOCOL)
+    return copied, unchanged, missing
+
+
+def sync_images(app):
+    """Copy the images referenced by the doxygen corpus from
+    `app.config.doxygen_image_dir` to the ``images`` directory of the
+    source tree.
+    """
+    source = app.config.doxygen_image_dir
+    if not source:
+        return
+    if not os.path.isdir(source):
+        raise ExtensionError(
+            '[sphinxcontrib-autodoc_doxygen] No such directory '
+            'doxygen_image_dir="%s"' % source)
+
+    os.makedirs(app.doctreedir, exist_ok=True)
+    copied, unchanged, missing = copy_images(
+        get_doxygen_index().images, source, os.path.join(app.srcdir, IMAGES_DIR),
+        os.path.join(app.doctreedir, MANIFEST))
+
+    logger.info('[autodoc_doxygen] images: %d copied, %d unchanged',
+                len(copied), len(unchanged))
+    for name in missing:
+        logger.warning('[autodoc_doxygen] image %s not found in doxygen_image_dir="%s"',
+                       name, source)
@@ -0,0 +1,978 @@
+from __future__ import print_function, absolute_import, division
+
+import contextlib
+import fnmatch
+import hashlib
+import os
+import threading
+from array import array
+
+from lxml import etree as ET
+
+
+class DoxygenIndex(object):
+    """Immutable, flat index over a Doxygen XML corpus.
+
+    Every ``compounddef`` (and every ``compound`` entry of ``index.xml``) is
+    serialized once into a single contiguous ``bytes`` buffer, and located
+    through an ``array`` of offsets. Every id, name and kind is stored once,
+    in a shared string table, and the lookup tables are arrays indexed
+    by string number, so the garbage collector never tracks them.
+
+    Nothing in the index is mutated after it is built: forked Sphinx workers
+    share its pages with the parent, and each process parses on demand only
+    the compounds it actually needs into its own private cache.
+    """
+
+    def __init__(self, buffer, spans, strings, compound_slots, element_slots,
+                 kinds, names, fullnames, typefields, compound_names, compounds,
+                 enums, functions, images=(), type_fields=None, excluded=frozenset(),
+                 root=None):
+        self.buffer = buffer                  # serialized elements, back to back
+        self._spans = spans                   # array('Q'): start, end of each slot
+        self._strings = strings               # the string table: (string, ...)
+        self._numbers = dict((string, number) for number, string in enumerate(strings))
+        # array('i')s indexed by the string number of an id, -1 where unset
+        self._compound_slots = compound_slots  # slot of the compounddef with that id
+        self._element_slots = element_slots   # slot of the compound holding that id
+        self._kinds = kinds                   # string number of the compounddef's kind
+        self._names = names                   # string number of the compound or member name
+        self._fullnames = fullnames           # ... of the last word of a memberdef definition
+        self._typefields = typefields         # ... and of the rest of it
+        self._compound_names = compound_names  # compoundname -> (slot, ...)
+        self._enums = enums                   # enum memberdef id -> (value name, ...)
+        self._type_fields = type_fields or {}  # type id -> fields, see read_type_fields()
+        self._functions = functions           # frozenset of 'compound::function' names
+        self.compounds = compounds            # index.xml: ((refid, kind, name, slot), ...)
+        self.images = images                  # sorted names of the <image>s in descriptions
+        self._excluded = excluded             # frozenset of the ids left out by a CompoundFilter
+        self.root = root                      # the tree this was built from, if any
+
+        # index.xml compound names, partitioned by kind
+        kinds = {}
+        for refid, kind, name, slot in compounds:
+            kinds.setdefault(kind, []).append(name)
+        self._names_by_kind = dict((kind, tuple(names)) for kind, names in kinds.items())
+        # documentation pages, other than the main page
+        self.pages = tuple(name for refid, kind, name, slot in compounds
+                           if kind == 'page' and refid != 'indexpage')
+
+        self._signature = None
+        self._descriptions = {}   # 2 * id number + tag -> lines, see prerender_descriptions()
+        self._parsed = {}
+        self._by_id = {}          # id -> element, for the compounds parsed so far
+        self._enum_values = {}
+        self._function_counts = None
+        self._pid = os.getpid()
+
+    def __getstate__(self):
+        # only pickle the corpus and its tables, not the per-process caches
+        state = self.__dict__.copy()
+        for name in ('_numbers', '_parsed', '_by_id', '_enum_values', '_function_counts',
+                     '_pid', 'root'):
+            del state[name]
+        state['_signature'] = self.signature
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._numbers = dict((string, number) for number, string in enumerate(self._strings))
+        self.root = None
+        self._parsed = {}
+        self._by_id = {}
+        self._enum_values = {}
+        self._function_counts = None
+        self._pid = os.getpid()
+
+    @classmethod
+    def from_files(cls, files, compound_filter=None):
+        builder = _IndexBuilder(compound_filter)
+        if compound_filter is not None:
+            # read index.xml first, so that the files of the compounds it
+            # excludes are never opened
+            with contextlib.closing(_parse_files(_index_files(files))) as roots:
+                for root in roots:
+                    builder.add(root)
+            files = builder.remaining_files(files)
+        with contextlib.closing(_parse_files(files)) as roots:
+            for root in roots:
+                builder.add(root)
+        return builder.build()
+
+    @classmethod
+    def from_archive(cls, filename, compound_filter=None):
+        """Build the index from the XML files in a tar or zip archive,
+        parsing them straight from memory, while the next ones are
+        decompressed in the background.
+        """
+        builder = _IndexBuilder(compound_filter)
+        with contextlib.closing(_read_ahead(_iter_archive(filename))) as members:
+            for name, data in members:
+                builder.add(ET.fromstring(data))
+        return builder.build()
+
+    @classmethod
+    def from_root(cls, root):
+        builder = _IndexBuilder()
+        builder.add(root)
+        return builder.build(root=root)
+
+    def __len__(self):
+        return len(self._spans) // 2
+
+    @property
+    def signature(self):
+        """A digest of the whole corpus, used to invalidate anything cached
+        from it.
+        """
+        if self._signature is None:
+            self._signature = hashlib.sha1(self.buffer).hexdigest()
+        return self._signature
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            # we are in a forked worker: never touch the parent's elements
+            self._parsed = {}
+            self._by_id = {}
+            self._enum_values = {}
+            self._pid = os.getpid()
+
+    def _parse(self, slot):
+        self._check_pid()
+
+        node = self._parsed.get(slot)
+        if node is None:
+            start, end = self._spans[2 * slot], self._spans[2 * slot + 1]
+            node = self._parsed[slot] = ET.fromstring(self.buffer[start:end])
+            # remember where everything with an id is, in a single pass
+            by_id = self._by_id
+            for child in node.iterfind('.//*[@id]'):
+                by_id.setdefault(child.get('id'), child)
+        return node
+
+    def prerender_descriptions(self):
+        """Format the brief and detailed description of every compound,
+        member and enum value once, and keep the lines in the index.
+
+        This needs the index to be the current one (see `load_doxygen_index`),
+        since references are resolved against it.
+        """
+        from .xmlutils import format_xml_paragraph
+        descriptions = {}
+        for slot in range(len(self)):
+            for node in self._parse(slot).iter('compounddef', 'memberdef', 'enumvalue'):
+                number = self._numbers.get(node.get('id'))
+                if number is None:
+                    continue
+                for tag, bit in _DESCRIPTION_TAGS:
+                    description = node.find(tag)
+                    if description is not None:
+                        descriptions[2 * number + bit] = tuple(format_xml_paragraph(description))
+        self._descriptions = descriptions
+
+    def rendered_description(self, refid, tag):
+        """Get the pre-rendered lines of the *tag* description of the
+        element with the given id, or None.
+        """
+        if not self._descriptions:
+            return None
+        number = self._numbers.get(refid)
+        if number is None:
+            return None
+        return self._descriptions.get(2 * number + (tag == 'detaileddescription'))
+
+    def _lookup(self, table, refid):
+        # the entry of *table* for the string *refid*, or -1
+        number = self._numbers.get(refid)
+        if number is None or number >= len(table):
+            # not a string at all, or not an id
+            return -1
+        return table[number]
+
+    def _string(self, table, refid):
+        # the string that the entry of *table* for *refid* refers to, or None
+        number = self._lookup(table, refid)
+        if number < 0:
+            return None
+        return self._strings[number]
+
+    def compound(self, refid):
+        """Get the ``compounddef`` element with the given id, or None.
+        """
+        slot = self._lookup(self._compound_slots, refid)
+        if slot < 0:
+            return None
+        return self._parse(slot)
+
+    def compounds_by_name(self, name):
+        """Get a list of the ``compounddef`` elements with the given
+        ``compoundname``.
+        """
+        return [self._parse(slot) for slot in self._compound_names.get(name, ())]
+
+    def find_id(self, refid):
+        """Get any element (compound, member, enum value, section...) with
+        the given id, or None.
+        """
+        slot = self._lookup(self._element_slots, refid)
+        if slot < 0:
+            return None
+        node = self._parse(slot)
+        if node.get('id') == refid:
+            return node
+        return self._by_id.get(refid)
+
+    def member(self, refid):
+        """Get the ``memberdef`` element with the given id, as long as it
+        belongs directly to a section of its compound, or None.
+        """
+        node = self.find_id(refid)
+        if node is None or node.tag != 'memberdef':
+            return None
+        section = node.getparent()
+        if section is None or section.tag != 'sectiondef' or \
+                section.getparent() is None or section.getparent().tag != 'compounddef':
+            return None
+        return node
+
+    def is_excluded(self, refid):
+        """Whether the compound or member with the given id was left out
+        of the index by a `CompoundFilter`.
+        """
+        return refid in self._excluded
+
+    def has_id(self, refid):
+        """Whether any element of the corpus has the given id.
+        """
+        return self._lookup(self._element_slots, refid) >= 0
+
+    def compound_name(self, refid):
+        """Get the ``compoundname`` of the compound with the given id,
+        without parsing it, or None.
+        """
+        if self._lookup(self._compound_slots, refid) >= 0:
+            return self._string(self._names, refid)
+        return None
+
+    def member_name(self, refid):
+        """Get the name of the ``memberdef`` with the given id, without
+        parsing its compound, or None.
+        """
+        if self._lookup(self._compound_slots, refid) >= 0:
+            return None
+        return self._string(self._names, refid)
+
+    def member_fullname(self, refid):
+        """Get the qualified name of the ``memberdef`` with the given id (the
+        last word of its ``definition``), without parsing it, or None.
+        """
+        return self._string(self._fullnames, refid)
+
+    def member_typefield(self, refid):
+        """Get the ``definition`` of the ``memberdef`` with the given id,
+        without its last word (e.g. ``integer function``), or None.
+        """
+        return self._string(self._typefields, refid)
+
+    def has_name(self, name):
+        """Whether there is a compound with the given name, or a function
+        with the given qualified name (``compound::function``).
+        """
+        return name in self._compound_names or name in self._functions
+
+    def function_count(self, name):
+        """Get the number of functions of the compound with the given name.
+        """
+        if self._function_counts is None:
+            self._function_counts = _count_functions(self._functions)
+        return self._function_counts.get(name, 0)
+
+    def compound_size(self, name):
+        """Get the size, in bytes of XML, of the ``compounddef`` elements
+        with the given ``compoundname``, without parsing them.
+        """
+        spans = self._spans
+        return sum(spans[2 * slot + 1] - spans[2 * slot]
+                   for slot in self._compound_names.get(name, ()))
+
+    def compound_kind(self, refid):
+        """Get the kind of the ``compounddef`` with the given id, without
+        parsing it, or None.
+        """
+        return self._string(self._kinds, refid)
+
+    def compounds_of_kind(self, kind):
+        """Get a tuple of the names of the ``index.xml`` compounds of the
+        given kind (namespace, class, type, page, module, file...).
+        """
+        return self._names_by_kind.get(kind, ())
+
+    def enum_values(self, refid):
+        """Get a tuple of ``(name, description lines)`` for the values of
+        the enum ``memberdef`` with the given id, or None.
+
+        The value names are collected when the index is built, and the
+        descriptions are formatted once, on first use.
+        """
+        self._check_pid()
+        values = self._enum_values.get(refid)
+        if values is None:
+            names = self._enums.get(refid)
+            if names is None:
+                return None
+            from .xmlutils import format_description
+            enum = self.find_id(refid)
+            descriptions = [tuple(format_description(value))
+                            for value in enum.findall('./enumvalue')
+                            if value.find('detaileddescription') is not None]
+            values = self._enum_values[refid] = tuple(zip(names, descriptions))
+        return values
+
+    def type_fields(self, refid):
+        """Get the fields of the derived type (``compounddef`` of kind
+        ``type``) with the given id, as returned by `read_type_fields`, or
+        None.
+        """
+        return self._type_fields.get(refid)
+
+    def getroot(self):
+        """Build a single root element holding the whole corpus.
+
+        This parses every compound, so it should only be used by legacy
+        callers that really need to run arbitrary XPath over the corpus.
+        """
+        if self.root is None:
+            root = ET.Element('root')
+            for slot in range(len(self)):
+                start, end = self._spans[2 * slot], self._spans[2 * slot + 1]
+                root.append(ET.fromstring(self.buffer[start:end]))
+            self.root = root
+        return self.root
+
+
+class DoxygenTagIndex(object):
+    """Lightweight index read from a Doxygen tagfile.
+
+    Names, ids and kinds are resolved from the tagfile alone. The full XML
+    corpus is only loaded, by calling *load_xml*, the first time an element
+    (i.e. a description) is actually needed.
+    """
+
+    def __init__(self, data, compounds, compound_kinds, names, functions, load_xml,
+                 excluded=frozenset()):
+        self.data = data                      # raw tagfile contents
+        self.compounds = compounds            # ((refid, kind, name, None), ...)
+        self._compound_kinds = compound_kinds  # compound refid -> kind
+        self._names = names                   # compound or member id -> name
+        self._functions = functions           # frozenset of 'compound::function' names
+        self._excluded = excluded             # frozenset of the ids left out by a CompoundFilter
+        self._compound_names = frozenset(name for refid, kind, name, slot in compounds)
+        self._function_counts = None
+        self._load_xml = load_xml
+        self._xml = None
+        self.root = None
+
+        kinds = {}
+        for refid, kind, name, slot in compounds:
+            kinds.setdefault(kind, []).append(name)
+        self._kinds = dict((kind, tuple(names)) for kind, names in kinds.items())
+        self.pages = tuple(name for refid, kind, name, slot in compounds
+                           if kind == 'page' and refid != 'indexpage')
+        self.signature = hashlib.sha1(data).hexdigest()
+
+    @classmethod
+    def from_file(cls, tagfile, load_xml, compound_filter=None):
+        """Read *tagfile*, leaving out what *compound_filter* rejects, as
+        when the XML is loaded with it.
+        """
+        with open(tagfile, 'rb') as f:
+            data = f.read()
+
+        compounds = []
+        compound_kinds = {}
+        names = {}
+        functions = set()
+        excluded = set()
+        for compound in ET.fromstring(data).iterfind('compound'):
+            kind = compound.get('kind')
+            name = compound.findtext('name')
+            refid = _tagfile_id(compound.findtext('filename'))
+            if kind == 'page' and refid == 'index':
+                refid = 'indexpage'
+            members = [('%s_1%s' % (_tagfile_id(member.findtext('anchorfile')),
+                                    member.findtext('anchor')), member)
+                       for member in compound.iterfind('member')
+                       # enum values are not memberdefs in the XML
+                       if member.get('kind') != 'enumvalue']
+
+            if compound_filter is not None and not compound_filter.accepts(kind, name):
+                excluded.add(refid)
+                excluded.update(member_id for member_id, member in members)
+                continue
+            compounds.append((refid, kind, name, None))
+            compound_kinds[refid] = kind
+            names[refid] = name
+
+            for member_id, member in members:
+                if compound_filter is not None and \
+                        member.get('protection') in compound_filter.exclude_prot:
+                    excluded.add(member_id)
+                    continue
+                member_name = member.findtext('name')
+                names[member_id] = member_name
+                if member.get('kind') in ('function', 'subroutine'):
+                    functions.add('%s::%s' % (name, member_name))
+
+        return cls(data, tuple(compounds), compound_kinds, names, frozenset(functions),
+                   load_xml, frozenset(excluded))
+
+    def __len__(self):
+        return len(self.compounds)
+
+    @property
+    def xml(self):
+        """The full `DoxygenIndex`, loaded on first use.
+        """
+        if self._xml is None:
+            self._xml = self._load_xml()
+        return self._xml
+
+    # lookups answered from the tagfile
+
+    def has_id(self, refid):
+        return refid in self._names
+
+    def compound_name(self, refid):
+        if refid in self._compound_kinds:
+            return self._names[refid]
+        return None
+
+    def member_name(self, refid):
+        if refid in self._compound_kinds:
+            return None
+        return self._names.get(refid)
+
+    def has_name(self, name):
+        return name in self._compound_names or name in self._functions
+
+    def function_count(self, name):
+        if self._function_counts is None:
+            self._function_counts = _count_functions(self._functions)
+        return self._function_counts.get(name, 0)
+
+    def compound_kind(self, refid):
+        return self._compound_kinds.get(refid)
+
+    def compounds_of_kind(self, kind):
+        return self._kinds.get(kind, ())
+
+    # lookups that need the full XML
+
+    def compound(self, refid):
+        return self.xml.compound(refid)
+
+    def compounds_by_name(self, name):
+        return self.xml.compounds_by_name(name)
+
+    def find_id(self, refid):
+        return self.xml.find_id(refid)
+
+    def member(self, refid):
+        return self.xml.member(refid)
+
+    def member_fullname(self, refid):
+        return self.xml.member_fullname(refid)
+
+    def member_typefield(self, refid):
+        return self.xml.member_typefield(refid)
+
+    def enum_values(self, refid):
+        return self.xml.enum_values(refid)
+
+    def type_fields(self, refid):
+        return self.xml.type_fields(refid)
+
+    def compound_size(self, name):
+        return self.xml.compound_size(name)
+
+    def is_excluded(self, refid):
+        return refid in self._excluded or \
+            (self._xml is not None and self._xml.is_excluded(refid))
+
+    @property
+    def images(self):
+        return self.xml.images
+
+    def rendered_description(self, refid, tag):
+        if self._xml is None:
+            return None
+        return self._xml.rendered_description(refid, tag)
+
+    def getroot(self):
+        return self.xml.getroot()
+
+
+ARCHIVE_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz', '.zip')
+
+
+def _count_functions(functions):
+    # compound name -> number of its functions, from 'compound::function' names
+    counts = {}
+    for name in functions:
+        compound = name.rpartition('::')[0]
+        counts[compound] = counts.get(compound, 0) + 1
+    return counts
+
+
+def is_archive(filename):
+    """Whether *filename* looks like an archive `DoxygenIndex.from_archive`
+    can read.
+    """
+    return filename.lower().endswith(ARCHIVE_SUFFIXES) and os.path.isfile(filename)
+
+
+def _is_xml_member(name):
+    basename = name.rsplit('/', 1)[-1]
+    return basename.lower().endswith('.xml') and not basename.startswith('._')
+
+
+def _iter_archive(filename, jobs=4, chunk=64):
+    """Yield ``(name, data)`` for the XML files in the archive *filename*,
+    in archive order.
+    """
+    if filename.lower().endswith('.zip'):
+        import zipfile
+
+        with zipfile.ZipFile(filename) as archive:
+            names = [info.filename for info in archive.infolist()
+                     if not info.is_dir() and _is_xml_member(info.filename)]
+            # members are compressed independently: inflate them in parallel
+            for name, data in _map_batched(archive.read, names, jobs, chunk):
+                yield name, data
+    else:
+        import tarfile
+
+        # a single compressed stream, read front to back
+        with tarfile.open(filename, 'r|*') as archive:
+            for member in archive:
+                if member.isfile() and _is_xml_member(member.name):
+                    yield member.name, archive.extractfile(member).read()
+
+
+def _map_batched(read, names, jobs=4, chunk=64):
+    """Yield ``(name, read(name))`` for *names*, in order, with up to
+    *jobs* calls of *read* running at once, *chunk* names at a time.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(jobs) as executor:
+        for start in range(0, len(names), chunk):
+            batch = names[start:start + chunk]
+            for name, data in zip(batch, executor.map(read, batch)):
+                yield name, data
+
+
+def _read_file(filename):
+    # unbuffered: a single read into a bytes object sized from fstat,
+    # which is then parsed as it is
+    with open(filename, 'rb', buffering=0) as f:
+        return f.read()
+
+
+def _parse_files(files, jobs=4):
+    """Parse the XML *files*, in order, while the next ones are read in
+    the background: on network filesystems and cold caches, waiting for
+    each small file in turn is what loading the corpus takes.
+    """
+    with contextlib.closing(_read_ahead(_map_batched(_read_file, files, jobs))) as contents:
+        for filename, data in contents:
+            yield ET.fromstring(data, base_url=filename)
+
+
+def _read_ahead(iterable, size=32):
+    """Iterate over *iterable* in a background thread, staying up to
+    *size* items ahead of the consumer.
+
+    When the consumer stops early, by closing the generator or on an
+    error, the thread is stopped and *iterable* closed before returning,
+    so that no thread is left behind.
+    """
+    import queue
+
+    items = queue.Queue(size)
+    stop = threading.Event()
+    end = object()
+
+    def produce():
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    break
+                items.put((item, None))
+        except Exception as exc:
+            items.put((None, exc))
+        finally:
+            try:
+                close = getattr(iterable, 'close', None)
+                if close is not None:
+                    close()
+            finally:
+                items.put((end, None))
+
+    thread = threading.Thread(target=produce, name='doxygen-xml-reader')
+    thread.daemon = True
+    thread.start()
+    item = None
+    try:
+        while True:
+            item, exc = items.get()
+            if exc is not None:
+                raise exc
+            if item is end:
+                break
+            yield item
+    finally:
+        stop.set()
+        # unblock the producer, and wait until it is done
+        while item is not end:
+            item, exc = items.get()
+        thread.join()
+
+
+_DESCRIPTION_TAGS = (('briefdescription', 0), ('detaileddescription', 1))
+
+
+def read_type_fields(node):
+    """Parse the components of the derived type *node* (a ``compounddef``)
+    into a tuple of ``(name, base type, shape, attributes, private, brief)``:
+    for ``real, dimension(:), pointer :: x``, that is ``('x', 'real',
+    '(:)', ('pointer',), False, brief)``, where *brief* is the text of
+    the first paragraph of its brief description, or None.
+    """
+    from .xmlutils import flatten
+    fields = []
+    for member in node.iterfind('./sectiondef/memberdef'):
+        # very rudimentary parsing of the type attributes
+        attributes = flatten(member.find('type')).strip().split(', ')
+        shape = ''
+        for word in attributes:
+            if word.startswith('dimension'):
+                shape = word[len('dimension'):]
+        brief = member.find('briefdescription/para')
+        if brief is not None:
+            brief = brief.text or ''
+        fields.append((member.findtext('name'), attributes[0], shape,
+                       tuple(w for w in attributes[1:] if not w.startswith('dimension')),
+                       member.get('prot') == 'private', brief))
+    return tuple(fields)
+
+
+def _tagfile_id(filename):
+    # tagfiles refer to the html output: "classfoo.html" -> "classfoo"
+    if filename is None:
+        return None
+    return os.path.splitext(filename)[0] if filename.endswith('.html') else filename
+
+
+class DoxygenXmlWatcher(object):
+    """Keep a doxygen index loaded between rebuilds in the same process.
+
+    Every call to `load` stats the XML files. If none of them changed, the
+    previous index is returned as is, along with everything already parsed
+    into it; otherwise only the new or modified files are parsed again, and
+    the index is rebuilt from the pieces kept for the others.
+    """
+
+    def __init__(self, compound_filter=None):
+        self.compound_filter = compound_filter
+        self.index = None
+        self._stamps = []     # (filename, stamp) of all the files, skipped ones too
+        self._builders = {}   # filename -> (stamp, _IndexBuilder of that file)
+
+    @staticmethod
+    def _stamp(filename):
+        st = os.stat(filename)
+        return st.st_mtime_ns, st.st_size
+
+    def load(self, files):
+        stamps = [(filename, self._stamp(filename)) for filename in files]
+        if self.index is not None and stamps == self._stamps:
+            return self.index
+        all_stamps = stamps
+
+        builders = {}
+        merged = _IndexBuilder(self.compound_filter)
+        if self.compound_filter is not None:
+            # index.xml first, to skip the files of the compounds it excludes
+            index_files = _index_files(files)
+            self._update(merged, builders,
+                         [stamp for stamp in stamps if stamp[0] in index_files])
+            stamps = [stamp for stamp in stamps if stamp[0] not in index_files and
+                      not merged.is_excluded_file(stamp[0])]
+        self._update(merged, builders, stamps)
+
+        self._builders = builders
+        self._stamps = all_stamps
+        self.index = merged.build()
+        return self.index
+
+    def _update(self, merged, builders, stamps):
+        # add the builders of the files of *stamps* to *merged*, parsing
+        # the files that changed again
+        changed = [filename for filename, stamp in stamps
+                   if self._builders.get(filename, (None,))[0] != stamp]
+        with contextlib.closing(_parse_files(changed)) as roots:
+            for filename, stamp in stamps:
+                cached = self._builders.get(filename)
+                if cached is None or cached[0] != stamp:
+                    builder = _IndexBuilder(self.compound_filter)
+                    builder.add(next(roots))
+                    cached = (stamp, builder)
+                builders[filename] = cached
+                merged.extend(cached[1])
+
+
+class CompoundFilter(object):
+    """Which compounds and members to load into the index.
+
+    A compound is kept if its kind is in *include_kinds* (when given) and
+    not in *exclude_kinds*, and if its name matches one of the `fnmatch`
+    patterns of *include_names* (when given) and none of *exclude_names*.
+    Members and inner classes whose ``prot`` is in *exclude_prot* are
+    removed from the compounds that are kept.
+    """
+
+    def __init__(self, include_kinds=(), exclude_kinds=(), include_names=(),
+                 exclude_names=(), exclude_prot=()):
+        self.include_kinds = frozenset(include_kinds)
+        self.exclude_kinds = frozenset(exclude_kinds)
+        self.include_names = tuple(include_names)
+        self.exclude_names = tuple(exclude_names)
+        self.exclude_prot = frozenset(exclude_prot)
+
+    @classmethod
+    def from_config(cls, config):
+        """Get the filter set up by the ``doxygen_include_*`` and
+        ``doxygen_exclude_*`` settings, or None if they are all empty.
+        """
+        compound_filter = cls(config.doxygen_include_kinds, config.doxygen_exclude_kinds,
+                              config.doxygen_include_names, config.doxygen_exclude_names,
+                              config.doxygen_exclude_prot)
+        return compound_filter if compound_filter.key != cls().key else None
+
+    @property
+    def key(self):
+        return (tuple(sorted(self.include_kinds)), tuple(sorted(self.exclude_kinds)),
+                self.include_names, self.exclude_names, tuple(sorted(self.exclude_prot)))
+
+    def accepts(self, kind, name):
+        if self.include_kinds and kind not in self.include_kinds:
+            return False
+        if kind in self.exclude_kinds:
+            return False
+        if name is None:
+            return not self.include_names
+        if self.include_names and not any(fnmatch.fnmatchcase(name, pattern)
+                                          for pattern in self.include_names):
+            return False
+        return not any(fnmatch.fnmatchcase(name, pattern) for pattern in self.exclude_names)
+
+
+def _index_files(files):
+    return [file for file in files if os.path.basename(file) == 'index.xml']
+
+
+class _IndexBuilder(object):
+
+    def __init__(self, compound_filter=None):
+        self.compound_filter = compound_filter
+        self.excluded = set()
+        self.chunks = []
+        self.offset = 0
+        self.spans = array('Q')
+        self.compound_ids = {}
+        self.compound_names = {}
+        self.element_ids = {}
+        self.compound_kinds = {}
+        self.enums = {}
+        self.type_fields = {}
+        self.names = {}
+        self.functions = set()
+        self.images = set()
+        self.fullnames = {}
+        self.typefields = {}
+        self.compounds = []
+
+    def _store(self, node):
+        data = ET.tostring(node, encoding='utf-8', with_tail=False)
+        slot = len(self.spans) // 2
+        self.chunks.append(data)
+        self.spans.append(self.offset)
+        self.offset += len(data)
+        self.spans.append(self.offset)
+        return slot
+
+    def add(self, root):
+        if root.tag == 'compounddef':
+            self.add_compounddef(root)
+            return
+
+        for node in root:
+            if node.tag == 'compounddef':
+                self.add_compounddef(node)
+            elif node.tag == 'compound':
+                if self.compound_filter is not None and not \
+                        self.compound_filter.accepts(node.get('kind'), node.findtext('name')):
+                    self.excluded.add(node.get('refid'))
+                    self.excluded.update(member.get('refid')
+                                         for member in node.iterfind('member'))
+                    continue
+                slot = self._store(node)
+                self.compounds.append((node.get('refid'), node.get('kind'),
+                                       node.findtext('name'), slot))
+
+    def is_excluded_file(self, filename):
+        # whether *filename* holds a compound index.xml excluded
+        return os.path.splitext(os.path.basename(filename))[0] in self.excluded
+
+    def remaining_files(self, files):
+        """The *files* still to be added once index.xml has been."""
+        index_files = _index_files(files)
+        return [file for file in files
+                if file not in index_files and not self.is_excluded_file(file)]
+
+    def _exclude(self, node):
+        self.excluded.update(child.get('id') for child in node.iterfind('.//*[@id]'))
+        self.excluded.add(node.get('id'))
+
+    def add_compounddef(self, node):
+        compound_filter = self.compound_filter
+        if compound_filter is not None:
+            if not compound_filter.accepts(node.get('kind'), node.findtext('compoundname')):
+                self._exclude(node)
+                return
+            if compound_filter.exclude_prot:
+                for child in node.xpath('./sectiondef/memberdef | ./innerclass'):
+                    if child.get('prot') in compound_filter.exclude_prot:
+                        if child.tag == 'memberdef':
+                            self._exclude(child)
+                        child.getparent().remove(child)
+
+        slot = self._store(node)
+        refid = node.get('id')
+        self.compound_ids[refid] = slot
+        name = node.findtext('compoundname')
+        self.compound_names[name] = self.compound_names.get(name, ()) + (slot,)
+        self.compound_kinds[refid] = node.get('kind')
+        self.names[refid] = name
+        for member in node.iterfind('./sectiondef/memberdef'):
+            member_id = member.get('id')
+            self.names[member_id] = member.findtext('name')
+            if member.get('kind') == 'function':
+                self.functions.add('%s::%s' % (name, member.findtext('name')))
+            definition = (member.findtext('definition') or '').split()
+            if definition:
+                self.fullnames[member_id] = definition[-1]
+                self.typefields[member_id] = ' '.join(definition[:-1])
+        for child in node.iterfind('.//*[@id]'):
+            self.element_ids.setdefault(child.get('id'), slot)
+        self.element_ids.setdefault(refid, slot)
+        for enum in node.iterfind('./sectiondef/memberdef[@kind="enum"]'):
+            self.enums[enum.get('id')] = tuple(n.text for n in enum.iterfind('./enumvalue/name'))
+        if node.get('kind') == 'type':
+            self.type_fields[refid] = read_type_fields(node)
+        for image in node.iter('image'):
+            if image.get('name'):
+                self.images.add(image.get('name'))
+
+    def extend(self, other):
+        """Append everything collected by the builder *other*."""
+        base = len(self.spans) // 2
+        self.chunks.extend(other.chunks)
+        self.spans.extend(self.offset + offset for offset in other.spans)
+        self.offset += other.offset
+
+        for refid, slot in other.compound_ids.items():
+            self.compound_ids[refid] = base + slot
+        for name, slots in other.compound_names.items():
+            self.compound_names[name] = self.compound_names.get(name, ()) + \
+                tuple(base + slot for slot in slots)
+        for refid, slot in other.element_ids.items():
+            self.element_ids.setdefault(refid, base + slot)
+        self.compound_kinds.update(other.compound_kinds)
+        self.enums.update(other.enums)
+        self.type_fields.update(other.type_fields)
+        self.excluded.update(other.excluded)
+        self.names.update(other.names)
+        self.functions.update(other.functions)
+        self.images.update(other.images)
+        self.fullnames.update(other.fullnames)
+        self.typefields.update(other.typefields)
+        self.compounds.extend((refid, kind, name, base + slot)
+                              for refid, kind, name, slot in other.compounds)
+
+    def build(self, root=None):
+        strings = _StringTable()
+        # number the ids first, so that the tables stay short
+        for ids in (self.element_ids, self.compound_ids, self.names):
+            for refid in ids:
+                strings.number(refid)
+        size = len(strings.strings)
+
+        compound_slots = strings.table(size, self.compound_ids, int)
+        element_slots = strings.table(size, self.element_ids, int)
+        kinds = strings.table(size, self.compound_kinds, strings.number)
+        names = strings.table(size, self.names, strings.number)
+        fullnames = strings.table(size, self.fullnames, strings.number)
+        typefields = strings.table(size, self.typefields, strings.number)
+
+        intern = strings.intern
+        compound_names = dict((intern(name), slots)
+                              for name, slots in self.compound_names.items())
+        compounds = tuple((intern(refid), intern(kind), intern(name), slot)
+                          for refid, kind, name, slot in self.compounds)
+        enums = dict((intern(refid), tuple(intern(value) for value in values))
+                     for refid, values in self.enums.items())
+        type_fields = dict(
+            (intern(refid), tuple((intern(name), intern(base), intern(shape),
+                                   tuple(intern(a) for a in attributes), private, brief)
+                                  for name, base, shape, attributes, private, brief in fields))
+            for refid, fields in self.type_fields.items())
+
+        return DoxygenIndex(b''.join(self.chunks), self.spans, tuple(strings.strings),
+                            compound_slots, element_slots, kinds, names, fullnames,
+                            typefields, compound_names, compounds, enums,
+                            frozenset(self.functions), tuple(sorted(self.images)),
+                            type_fields, frozenset(self.excluded), root=root)
+
+
+class _StringTable(object):
+    """Numbers each distinct string once, in order of appearance."""
+
+    def __init__(self):
+        self.strings = []
+        self.numbers = {}
+
+    def number(self, string):
+        number = self.numbers.get(string)
+        if number is None:
+            number = self.numbers[string] = len(self.strings)
+            self.strings.append(string)
+        return number
+
+    def intern(self, string):
+        # the table's own copy of *string*
+        if string is None:
+            return None
+        return self.strings[self.number(string)]
+
+    def table(self, size, mapping, value):
+        """Build an ``array`` of *size* entries, mapping the number of each
+        id of *mapping* to ``value(mapping[id])``, and the others to -1.
+        """
+        numbers = self.numbers
+        table = array('i', [-1]) * size
+        for refid, item in mapping.items():
+            if item is not None:
+                table[numbers[refid]] = value(item)
+        return table
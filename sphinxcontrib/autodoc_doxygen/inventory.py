@@ -0,0 +1,188 @@
+"""Write a Sphinx inventory (``objects.inv``) straight from the doxygen
+index, for other projects to link to with intersphinx, without building
+the HTML pages.
+
+The stubs the autodoxysummary directives of the sources would generate
+are worked out as by ``sphinx-doxygen-autogen --dry-run``. Each stub
+becomes a ``std:doc`` entry, and the module pages get the ``f:`` targets
+the documenters emit for the modules and their types and procedures.
+"""
+from __future__ import print_function, absolute_import, division
+
+import argparse
+import os
+import sys
+import zlib
+
+from sphinx.errors import ExtensionError
+
+# separator of module and member names in the fortran domain
+F_SEP = '/'
+
+
+def _quiet(msg):
+    pass
+
+
+def _docname(filename, srcdir):
+    return os.path.relpath(os.path.splitext(filename)[0], srcdir).replace(os.sep, '/')
+
+
+def _module_entries(ns, uri):
+    """The ``f:`` objects documented on the namespace stub *ns*."""
+    from . import get_doxygen_index
+    index = get_doxygen_index()
+    module = ns['fullname']
+
+    for name in ns.get('types', ()):
+        name = module + F_SEP + name.split('::')[-1]
+        yield name, 'f:type', 1, uri + '#' + name
+
+    methods = set(ns.get('methods', ()))
+    if not methods:
+        return
+    for compound in index.compounds_by_name(module):
+        for member in compound.iterfind('./sectiondef/memberdef[@kind="function"]'):
+            if member.findtext('name') not in methods:
+                continue
+            typefield = index.member_typefield(member.get('id'))
+            if typefield is None:
+                typefield = ' '.join((member.findtext('definition') or '').split()[:-1])
+            role = 'f:subroutine' if 'subroutine' in typefield else 'f:function'
+            name = module + F_SEP + member.findtext('name')
+            yield name, role, 1, uri + '#' + name
+
+
+def collect_inventory(sources, srcdir, suffix='.rst', html_suffix='.html', split=0):
+    """Get the inventory entries, ``(name, domain:role, priority, uri,
+    display name)``, of the stubs generated for the autodoxysummary
+    directives in *sources*, whose docnames are relative to *srcdir*.
+
+    *split* is the ``doxygen_module_split`` of the project.
+    """
+    from .autosummary.generate import generate_autosummary_docs
+
+    status, namespaces = generate_autosummary_docs(
+        sources, suffix=suffix, overwrite=True, dry_run=True, split=split,
+        info=_quiet, return_namespaces=True)
+
+    entries = {}
+    for filename, ns in namespaces:
+        docname = _docname(filename, srcdir)
+        uri = docname + html_suffix
+        if ns is None:
+            entries[docname, 'std:doc'] = (-1, uri, docname)
+            continue
+
+        if 'title' in ns:
+            title = ns['title']
+        elif ns.get('objtype') == 'namespace':
+            title = '%s module reference' % ns['fullname']
+            entries[ns['fullname'], 'f:module'] = (0, uri + '#module-' + ns['fullname'], '-')
+        else:
+            title = ns['name']
+        entries[docname, 'std:doc'] = (-1, uri, title)
+
+        if ns.get('objtype') == 'namespace' and ('docname' in ns or not ns['parts']):
+            # the module page itself, or one of its parts
+            for name, role, priority, target in _module_entries(ns, uri):
+                entries[name, role] = (priority, target, '-')
+
+    return [(name, role) + entries[name, role] for name, role in sorted(entries)]
+
+
+def write_inventory(entries, filename, project='', version=''):
+    """Write the inventory *entries*, as returned by `collect_inventory`,
+    to *filename* in the format of Sphinx's ``objects.inv``.
+    """
+    lines = []
+    for name, role, priority, uri, dispname in entries:
+        if uri.endswith(name):
+            uri = uri[:-len(name)] + '$'
+        if dispname == name:
+            dispname = '-'
+        lines.append('%s %s %d %s %s\n' % (name, role, priority, uri, dispname))
+
+    with open(filename, 'wb') as f:
+        f.write(('# Sphinx inventory version 2\n'
+                 '# Project: %s\n'
+                 '# Version: %s\n'
+                 '# The remainder of this file is compressed using zlib.\n'
+                 % (project, version)).encode('utf-8'))
+        f.write(zlib.compress(''.join(lines).encode('utf-8'), 9))
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        usage='%(prog)s [OPTIONS] <SOURCE_FILE>...',
+        description="""
+Write the objects.inv inventory of the objects documented by the
+autodoxysummary directives of the given source files straight from the
+doxygen XML, without building the HTML pages, so that other projects can
+link to them with intersphinx.
+""")
+
+    parser.add_argument('source_file', nargs='+',
+                        help='source files with the autodoxysummary directives')
+    parser.add_argument('-x', '--doxygen-xml', action='store', dest='doxygen_xml',
+                        required=True,
+                        help='directory (or archive, or artifact) containing the '
+                             'doxygen XML output')
+    parser.add_argument('-o', '--output', action='store', dest='output',
+                        default='objects.inv',
+                        help='inventory file to write (default: %(default)s)')
+    parser.add_argument('--srcdir', action='store', dest='srcdir',
+                        help='Sphinx source directory (default: the directory of '
+                             'the first source file)')
+    parser.add_argument('-s', '--suffix', action='store', dest='suffix', default='rst',
+                        help='suffix of the source files (default: %(default)s)')
+    parser.add_argument('--html-suffix', action='store', dest='html_suffix',
+                        default='.html',
+                        help='suffix of the HTML pages (default: %(default)s)')
+    parser.add_argument('--split', action='store', dest='split', type=int, default=0,
+                        help='the doxygen_module_split of the project (default: 0)')
+    for option, metavar, what in (
+            ('include-kinds', 'KIND', 'only load compounds of this kind'),
+            ('exclude-kinds', 'KIND', "don't load compounds of this kind"),
+            ('include-names', 'PATTERN', 'only load compounds whose name matches'),
+            ('exclude-names', 'PATTERN', "don't load compounds whose name matches"),
+            ('exclude-prot', 'PROT', "don't load members with this protection")):
+        parser.add_argument('--' + option, action='append', dest=option.replace('-', '_'),
+                            metavar=metavar, default=[],
+                            help='%s, as doxygen_%s (may be repeated)'
+                                 % (what, option.replace('-', '_')))
+    parser.add_argument('--project', action='store', dest='project', default='',
+                        help='project name to write in the inventory')
+    parser.add_argument('--version', action='store', dest='version', default='',
+                        help='project version to write in the inventory')
+    return parser
+
+
+def main(argv=sys.argv[1:]):
+    from . import load_doxygen_index
+    from .index import CompoundFilter
+
+    args = get_parser().parse_args(argv)
+    srcdir = args.srcdir or os.path.dirname(os.path.abspath(args.source_file[0]))
+    compound_filter = CompoundFilter(args.include_kinds, args.exclude_kinds,
+                                     args.include_names, args.exclude_names,
+                                     args.exclude_prot)
+    if compound_filter.key == CompoundFilter().key:
+        compound_filter = None
+
+    try:
+        load_doxygen_index(args.doxygen_xml, compound_filter=compound_filter)
+    except ExtensionError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    entries = collect_inventory([os.path.abspath(s) for s in args.source_file],
+                                os.path.abspath(srcdir), '.' + args.suffix,
+                                args.html_suffix, args.split)
+    write_inventory(entries, args.output, args.project, args.version)
+
+    print('[doxygen] wrote %d objects to %s' % (len(entries), args.output))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""Order the documents to read so that a parallel read is balanced.
+
+With ``-j N``, Sphinx cuts the list of documents to read into chunks of
+consecutive documents, and hands them to the workers in that order. A
+few ``autodoxymodule`` pages with ``:methods:`` and ``:types:`` cost far
+more than all the others, and one worker ending up with several of them
+finishes long after the rest. Before the read, the cost of each document
+is estimated from its ``autodoxy*`` directives and the size of the
+compounds they document, the documents are spread over chunks of the
+same sizes as Sphinx's so that the chunks cost about the same, and the
+costliest chunks go first.
+"""
+from __future__ import print_function, absolute_import, division
+
+import io
+import re
+
+from sphinx.util import logging
+
+from . import get_doxygen_index
+
+logger = logging.getLogger(__name__)
+
+# costs, in bytes of doxygen XML, of what doesn't map to a compound
+SUMMARY_ITEM_COST = 500     # a row of an autodoxysummary table
+DESCRIPTION_COST = 2000     # the description of a module, or an enum
+
+_DIRECTIVE = re.compile(r'^(\s*)\.\.\s+(autodoxy\w+)::\s*(.*?)\s*$')
+_OPTION = re.compile(r'^\s*:([\w-]+):\s*(.*?)\s*$')
+
+
+def iter_directives(lines):
+    """Yield ``(name, argument, options, content)`` for the ``autodoxy*``
+    directives in the reST *lines*, where *content* is the list of the
+    stripped, non-empty lines of the directive body.
+    """
+    lines = list(lines)
+    for i, line in enumerate(lines):
+        match = _DIRECTIVE.match(line)
+        if match is None:
+            continue
+        indent = len(match.group(1))
+        options = {}
+        content = []
+        for line in lines[i + 1:]:
+            if line.strip() and len(line) - len(line.lstrip()) <= indent:
+                break
+            option = _OPTION.match(line)
+            if option is not None and not content:
+                options[option.group(1)] = option.group(2)
+            elif line.strip():
+                content.append(line.strip())
+        yield match.group(2), match.group(3), options, content
+
+
+def _names(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def _function_cost(index, module):
+    return index.compound_size(module) / max(index.function_count(module), 1)
+
+
+def directive_cost(index, name, argument, options, content):
+    """Estimate the cost of reading an ``autodoxy*`` directive."""
+    if name == 'autodoxymodule':
+        cost = 0 if 'part' in options else DESCRIPTION_COST
+        if 'methods' in options:
+            methods = _names(options['methods'])
+            if methods:
+                cost += len(methods) * _function_cost(index, argument)
+            else:
+                cost += index.compound_size(argument)
+        if 'types' in options:
+            types = _names(options['types']) or \
+                [type_name for type_name in index.compounds_of_kind('type')
+                 if type_name.startswith(argument + '::')]
+            cost += sum(index.compound_size(type_name) for type_name in types)
+        return cost
+    if name == 'autodoxytype':
+        return index.compound_size(argument)
+    if name == 'autodoxymethod':
+        return _function_cost(index, argument.rpartition('::')[0])
+    if name == 'autodoxysummary':
+        return len(content) * SUMMARY_ITEM_COST
+    return DESCRIPTION_COST
+
+
+def document_cost(index, text):
+    """Estimate the cost of reading the document with the reST *text*:
+    its own size, plus the cost of its ``autodoxy*`` directives.
+    """
+    return len(text) + sum(directive_cost(index, *directive)
+                           for directive in iter_directives(text.splitlines()))
+
+
+def balance(docnames, costs, nproc):
+    """Reorder the list *docnames* in place so that each of the chunks
+    Sphinx cuts it into for *nproc* workers costs about the same, the
+    costliest chunks first. *costs* maps each docname to its cost.
+    """
+    from sphinx.util.parallel import make_chunks
+
+    sizes = [len(chunk) for chunk in make_chunks(docnames, nproc)]
+    chunks = [[0, []] for size in sizes]
+    # the costliest documents first, each into the cheapest chunk with room
+    for docname in sorted(docnames, key=lambda docname: -costs[docname]):
+        chunk = min((chunk for chunk, size in zip(chunks, sizes) if len(chunk[1]) < size),
+                    key=lambda chunk: chunk[0])
+        chunk[0] += costs[docname]
+        chunk[1].append(docname)
+
+    # only the last chunk may be shorter, so it stays last
+    last = chunks.pop() if len(set(sizes)) > 1 else None
+    chunks.sort(key=lambda chunk: -chunk[0])
+    if last is not None:
+        chunks.append(last)
+    docnames[:] = [docname for cost, names in chunks for docname in names]
+    return [cost for cost, names in chunks]
+
+
+def order_docs(app, env, docnames):
+    """Reorder the documents to read for a balanced parallel read."""
+    if app.parallel <= 1 or len(docnames) <= 1:
+        return
+
+    index = get_doxygen_index()
+    costs = {}
+    for docname in docnames:
+        try:
+            with io.open(env.doc2path(docname), encoding=app.config.source_encoding,
+                         errors='replace') as f:
+                text = f.read()
+        except OSError:
+            text = ''
+        costs[docname] = document_cost(index, text)
+
+    chunk_costs = balance(docnames, costs, app.parallel)
+    logger.verbose('[autodoc_doxygen] read order: %d documents in %d chunks, '
+                   'the costliest at %.0f%% of the mean', len(docnames), len(chunk_costs),
+                   100. * max(chunk_costs) * len(chunk_costs) / max(sum(chunk_costs), 1))
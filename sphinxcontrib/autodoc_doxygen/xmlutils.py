@@ -1,5 +1,5 @@
 from __future__ import print_function, absolute_import, division
-from . import get_doxygen_root
+from . import get_doxygen_index
 
 def flatten(xmlnode):
     # <xmlnode>this.text<child0>child0.text</child0>child0.tail...</xmlnode>
@@ -33,7 +33,64 @@ def format_xml_paragraph(xmlnode):
     lines
         A list of lines.
     """
-    return [l.rstrip() for l in _DoxygenXmlParagraphFormatter().generic_visit(xmlnode).lines]
+    return list(iter_xml_paragraph(xmlnode))
+
+
+def iter_xml_paragraph(xmlnode):
+    """Like `format_xml_paragraph`, but yield the lines lazily.
+
+    The children of *xmlnode* are only formatted as the lines are consumed,
+    so stopping early skips the rest of the description.
+    """
+    formatter = _DoxygenXmlParagraphFormatter()
+    lines = formatter.lines
+    for child in xmlnode:
+        if child.tag == 'para' and child.text is not None and not formatter.continue_line:
+            # a paragraph starting with text starts a new line, so the
+            # lines before it are final
+            for line in lines:
+                yield line.rstrip()
+            del lines[:]
+        formatter.visit(child)
+        # only the last line may still be continued by the next child
+        for line in lines[:-1]:
+            yield line.rstrip()
+        del lines[:-1]
+    for line in lines:
+        yield line.rstrip()
+
+
+def format_description(xmlnode, tag='detaileddescription'):
+    """Format the *tag* description of a compound, member or enum value,
+    like ``format_xml_paragraph(xmlnode.find(tag))``, but use the lines
+    pre-rendered in the doxygen index when there are any.
+    """
+    return list(iter_description(xmlnode, tag))
+
+
+def iter_description(xmlnode, tag='detaileddescription'):
+    """Like `format_description`, but yield the lines lazily."""
+    lines = get_doxygen_index().rendered_description(xmlnode.get('id'), tag)
+    if lines is not None:
+        return iter(lines)
+    return iter_xml_paragraph(xmlnode.find(tag))
+
+
+def first_paragraph(lines):
+    """Get the first paragraph of the formatted *lines*: the lines up to
+    the first blank one, skipping leading blank lines, followed by a blank
+    line. Returns an empty list, having consumed all of *lines*, if there
+    is no text at all.
+    """
+    paragraph = []
+    for line in lines:
+        if line.strip():
+            paragraph.append(line)
+        elif paragraph:
+            break
+    if paragraph:
+        paragraph.append('')
+    return paragraph
 
 
 class _DoxygenXmlParagraphFormatter(object):
@@ -43,54 +100,86 @@ class _DoxygenXmlParagraphFormatter(object):
 
     # It's supposed to handle paragraphs, references, preformatted text (code blocks), and lists.
 
+    # All the output goes to the single `lines` list. Nested blocks (parameter
+    # lists, xrefsects, table cells) are formatted into a segment at its end,
+    # opened by `begin_segment` and cut out again by `end_segment`.
+    # `handlers`, set after the class body, maps each tag to the unbound
+    # ``visit_<tag>`` method.
+    __slots__ = ('lines', 'continue_line')
+
     def __init__(self):
         self.lines = ['']
         self.continue_line = False
 
     def visit(self, node):
-        method = 'visit_' + node.tag
-        visitor = getattr(self, method, self.generic_visit)
-        return visitor(node)
+        handler = self.handlers.get(node.tag)
+        if handler is None:
+            return self.generic_visit(node)
+        return handler(self, node)
 
     def generic_visit(self, node):
-        for child in node.getchildren():
+        for child in node:
             self.visit(child)
         return self
 
+    def begin_segment(self):
+        """Start formatting into a fresh segment, like a new formatter would."""
+        start = len(self.lines)
+        self.lines.append('')
+        return start
+
+    def end_segment(self, start):
+        """Remove the segment started at *start* and return its lines."""
+        segment = self.lines[start:]
+        del self.lines[start:]
+        return segment
+
+    def format_nested(self, node):
+        """Get the lines of *node* formatted on their own, as by a new
+        formatter: nothing carries over from or to the current paragraph.
+        """
+        continue_line = self.continue_line
+        self.continue_line = False
+        start = self.begin_segment()
+        self.generic_visit(node)
+        self.continue_line = continue_line
+        return self.end_segment(start)
+
     def visit_ref(self, node):
-        # find target node
+        # find target node, from the names and kinds in the index alone
+        index = get_doxygen_index()
         refid = node.get('refid')
         kind = None
+        name = None
 
         if node.get('kindref') == 'member':
-            ref = get_doxygen_root().find('./compounddef/sectiondef/memberdef[@id="%s"]' % refid)
+            found = index.member_name(refid) is not None
             # only set the kind if we find a function, otherwise it might be
             # a documentation reference
-            if ref is not None:
+            if found:
                 kind = 'func'
+                name = index.member_name(refid)
         elif node.get('kindref') == 'compound':
-            ref = get_doxygen_root().find('./compounddef[@id="%s"]' % refid)
-            if ref is not None:
-                if ref.get('kind') == 'namespace':
-                    kind = 'mod'
-                elif ref.get('kind') == 'type':
-                    kind = 'type'
+            found = index.compound_kind(refid) is not None
+            if index.compound_kind(refid) == 'namespace':
+                kind = 'mod'
+            elif index.compound_kind(refid) == 'type':
+                kind = 'type'
+            if kind is not None:
+                name = index.compound_name(refid)
         else:
             # we probably don't get here
-            print('warning: slow ref search!')
-            ref = get_doxygen_root().find('.//*[@id="%s"]' % refid)
-
-        # get name of target
-        if ref is not None:
-            name_node = None
+            found = index.has_id(refid)
 
-            if kind == 'func':
-                name_node = ref.find('./name')
-            elif kind == 'mod' or kind == 'type':
-                name_node = ref.find('./compoundname')
+        if not found and index.is_excluded(refid):
+            # the target was deliberately left out of the index: no link
+            self.lines[-1] += node.text or ''
+            return
 
-            if name_node is not None:
-                real_name = name_node.text.split('::')[-1]
+        # get name of target
+        if found:
+            if name is not None:
+                real_name = name.split('::')[-1]
             else:
                 self.lines[-1] += '(unimplemented link)' + node.text
                 return
@@ -162,7 +251,7 @@ class _DoxygenXmlParagraphFormatter(object):
         self.para_text(node.text)
 
         # visit children and append tail
-        for child in node.getchildren():
+        for child in node:
             self.visit(child)
             self.para_text(child.tail)
             self.continue_line = True
@@ -203,8 +292,10 @@ class _DoxygenXmlParagraphFormatter(object):
         self.continue_line = True
 
     def visit_parameterlist(self, node):
-        lines = [l for l in type(self)().generic_visit(node).lines if l is not '']
-        self.lines.extend([''] + lines + [''])
+        lines = self.lines
+        lines.append('')
+        lines.extend(l for l in self.format_nested(node) if l != '')
+        lines.append('')
 
     def visit_simplesect(self, node):
         if node.get('kind') == 'return':
@@ -249,7 +340,7 @@ class _DoxygenXmlParagraphFormatter(object):
 
     def visit_preformatted(self, node):
         segment = [node.text if node.text is not None else '']
-        for n in node.getchildren():
+        for n in node:
             segment.append(n.text)
             if n.tail is not None:
                 segment.append(n.tail)
@@ -259,7 +350,7 @@ class _DoxygenXmlParagraphFormatter(object):
 
     def visit_programlisting(self, node):
         lines = []
-        for n in node.getchildren():
+        for n in node:
             lines.append(flatten(n))
         self.preformat_text(lines)
 
@@ -277,8 +368,9 @@ class _DoxygenXmlParagraphFormatter(object):
 
     def visit_xrefsect(self, node):
         title = node.find('xreftitle').text
-        sublines = type(self)().generic_visit(node).lines
-        self.lines.extend(['.. admonition:: %s' % title] + ['   ' + s for s in sublines])
+        sublines = self.format_nested(node)
+        self.lines.append('.. admonition:: %s' % title)
+        self.lines.extend('   ' + s for s in sublines)
 
     def visit_subscript(self, node):
         self.lines[-1] += '\ :sub:`%s` %s' % (node.text, node.tail)
@@ -287,8 +379,6 @@ class _DoxygenXmlParagraphFormatter(object):
         # save the number of columns
         cols = int(node.get('cols'))
         table = []
-        # save the current output
-        lines = self.lines
 
         # get width of each column
         widths = [0] * cols
@@ -296,13 +386,15 @@ class _DoxygenXmlParagraphFormatter(object):
         # build up the table contents
         for row_node in node.findall('row'):
             row = []
-            for i, entry in enumerate(row_node.getchildren()):
-                self.lines = ['']
+            for i, entry in enumerate(row_node):
+                # the paragraph state carries over from one cell to the next
+                start = self.begin_segment()
                 self.generic_visit(entry)
-                row.append(self.lines)
+                cell = self.end_segment(start)
+                row.append(cell)
 
                 # find width of this entry (including leading and trailing space)
-                widths[i] = max(widths[i], max([len(line) for line in self.lines]) + 2)
+                widths[i] = max(widths[i], max([len(line) for line in cell]) + 2)
 
             table.append(row)
 
@@ -329,7 +421,6 @@ class _DoxygenXmlParagraphFormatter(object):
 
             return lines
 
-        self.lines = lines
         # start with a blank
         self.lines.append('')
 
@@ -353,3 +444,9 @@ class _DoxygenXmlParagraphFormatter(object):
 
         # end with a blank
         self.lines.append('')
+
+
+_DoxygenXmlParagraphFormatter.handlers = dict(
+    (name[len('visit_'):], getattr(_DoxygenXmlParagraphFormatter, name))
+    for name in dir(_DoxygenXmlParagraphFormatter)
+    if name.startswith('visit_') and name != 'visit_sect')
@@ -0,0 +1,32 @@
+from types import SimpleNamespace
+
+from mock import patch
+
+from sphinxcontrib.autodoc_doxygen import envdata
+
+
+def test_extension_data():
+    env = SimpleNamespace(docname='api', doxygen_cache={'api': ('namespacefoo',)})
+    assert envdata.extension_data(env) == {'doxygen_cache': {'api': ('namespacefoo',)}}
+    assert envdata.extension_data(SimpleNamespace(docname='api')) == {}
+
+
+def test_report_size(tmpdir):
+    tmpdir.join('environment.pickle').write_binary(b'\0' * 1000)
+    app = SimpleNamespace(doctreedir=str(tmpdir), env=SimpleNamespace(docname='api'))
+
+    # nothing to report without doxygen data
+    with patch.object(envdata, 'logger') as logger:
+        envdata.report_size(app, None)
+    assert not logger.info.called
+
+    app.env.doxygen_cache = {'api': ('namespacefoo',)}
+    with patch.object(envdata, 'logger') as logger:
+        envdata.report_size(app, None)
+    args = logger.info.call_args[0]
+    assert args[2] == 1000 and 0 < args[1] < 1000
+
+    # nothing to report after a failed build
+    with patch.object(envdata, 'logger') as logger:
+        envdata.report_size(app, Exception())
+    assert not logger.info.called
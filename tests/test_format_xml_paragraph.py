@@ -1,5 +1,6 @@
 from lxml import etree as ET
-from sphinxcontrib.autodoc_doxygen.xmlutils import format_xml_paragraph
+from sphinxcontrib.autodoc_doxygen.xmlutils import format_xml_paragraph, iter_xml_paragraph, \
+    first_paragraph
 
 
 
@@ -246,3 +247,16 @@ Get the force field parameters for an angle term.
 
 '''
     assert '\n'.join(format_xml_paragraph(node)) == expected
+
+
+def test_streaming():
+    node = ET.fromstring('<detaileddescription><para>First <emphasis>one</emphasis>.</para>'
+                         '<para>Second.</para><table/></detaileddescription>')
+    # the table has no cols, so formatting it would raise
+
+    lines = iter_xml_paragraph(node)
+    assert first_paragraph(lines) == ['First', '*one*', '.', '']
+
+    node = ET.fromstring('<briefdescription>  <para> </para></briefdescription>')
+    assert first_paragraph(iter_xml_paragraph(node)) == []
+    assert list(iter_xml_paragraph(node)) == format_xml_paragraph(node)
@@ -0,0 +1,179 @@
+import os
+
+import lxml.etree as ET
+from mock import patch
+
+import sphinxcontrib.autodoc_doxygen
+from sphinxcontrib.autodoc_doxygen.autosummary import generate
+from sphinxcontrib.autodoc_doxygen.autosummary.generate import \
+    AutosummaryScanCache, find_autosummary_in_files
+
+
+SOURCE = '''
+.. autodoxysummary::
+   :toctree: generated/
+
+   foo::bar
+
+.. autodoxysummary::
+   :generate:
+   :kind: mod
+'''
+
+
+def set_corpus(*namespaces):
+    sphinxcontrib.autodoc_doxygen.setup.DOXYGEN_ROOT = ET.fromstring(
+        '<root>%s</root>' % ''.join(
+            '<compound refid="namespace%s" kind="namespace"><name>%s</name></compound>'
+            % (n, n) for n in namespaces))
+
+
+def test_scan_cache(tmpdir):
+    src = tmpdir.join('index.rst')
+    src.write(SOURCE)
+    cache_file = str(tmpdir.join('cache', 'scan.pickle'))
+    set_corpus('foo')
+
+    try:
+        first = find_autosummary_in_files([str(src)], cache=cache_file)
+        assert sorted(n for n, t, _ in first) == ['foo', 'foo::bar']
+
+        # unchanged files are not re-read
+        with patch.object(generate, '_scan_autosummary_file') as scan:
+            assert find_autosummary_in_files([str(src)], cache=cache_file) == first
+            assert not scan.called
+
+        # but a new doxygen index re-expands :generate: lists
+        set_corpus('foo', 'baz')
+        again = find_autosummary_in_files([str(src)], cache=cache_file)
+        assert sorted(n for n, t, _ in again) == ['baz', 'foo', 'foo::bar']
+
+        # and changed files are scanned again
+        src.write(SOURCE.replace('foo::bar', 'foo::qux'))
+        os.utime(str(src), (0, 0))
+        cache = AutosummaryScanCache(cache_file)
+        assert [e[0] for e in cache.scan(str(src))] == ['foo::qux', None]
+    finally:
+        del sphinxcontrib.autodoc_doxygen.setup.DOXYGEN_ROOT
+
+
+def test_recursive_generation(tmpdir):
+    # a namespace template that summarizes its classes into a toctree of
+    # its own, so the classes only show up once the namespace stub exists
+    tmpdir.join('templates', 'doxynamespace.rst').write('''{{ fullname }}
+
+.. autodoxysummary::
+   :toctree: classes/
+
+   foo::bar
+   foo::bar
+''', ensure=True)
+    src = tmpdir.join('index.rst')
+    src.write('''
+.. autodoxysummary::
+   :toctree: generated/
+
+   foo
+''')
+    sphinxcontrib.autodoc_doxygen.setup.DOXYGEN_ROOT = ET.fromstring('''<root>
+  <compounddef id="namespacefoo" kind="namespace">
+    <compoundname>foo</compoundname>
+  </compounddef>
+  <compounddef id="classfoo_1_1bar" kind="class">
+    <compoundname>foo::bar</compoundname>
+  </compounddef>
+</root>''')
+
+    try:
+        with patch.object(generate, '_generate_stubs', wraps=generate._generate_stubs) as gen:
+            generate.generate_autosummary_docs(
+                [str(src)], template_dir=str(tmpdir.join('templates')))
+        # the sources, then the namespace stub
+        assert gen.call_count == 2
+    finally:
+        del sphinxcontrib.autodoc_doxygen.setup.DOXYGEN_ROOT
+
+    assert tmpdir.join('generated', 'foo.rst').check()
+    assert tmpdir.join('generated', 'classes', 'foo.bar.rst').check()
+
+
+def test_stub_renderer(tmpdir):
+    cache_dir = str(tmpdir.join('cache'))
+    renderer = generate.get_stub_renderer(cache_dir=cache_dir)
+    assert generate.get_stub_renderer(cache_dir=cache_dir) is renderer
+
+    namespaces = [{'name': n, 'underline': '=' * len(n), 'text': ['Some text.']}
+                  for n in ('foo', 'quux')]
+    rendered = renderer.render_many('doxypage.rst', namespaces)
+    assert rendered[1] == renderer.render('doxypage.rst', namespaces[1])
+    assert rendered[0].splitlines()[:3] == ['===', 'foo', '===']
+
+    # the compiled template was stored for the next build
+    assert len(os.listdir(cache_dir)) == 1
+
+
+def test_main(tmpdir, capsys):
+    tmpdir.join('xml', 'namespacefoo.xml').write('''<doxygen>
+  <compounddef id="namespacefoo" kind="page">
+    <compoundname>foo</compoundname>
+    <title>Foo</title>
+    <detaileddescription><para>All about foo.</para></detaileddescription>
+  </compounddef>
+</doxygen>''', ensure=True)
+    src = tmpdir.join('index.rst')
+    src.write('''
+.. autodoxysummary::
+   :toctree: generated/
+
+   foo
+''')
+    args = ['-x', str(tmpdir.join('xml')), str(src)]
+
+    assert generate.main(args + ['--dry-run']) == 0
+    assert not tmpdir.join('generated').check()
+    assert capsys.readouterr().out.endswith('(dry run) 1 created, 0 updated, 0 unchanged\n')
+
+    generate.main(args + ['--jobs', '2'])
+    assert 'All about foo.' in tmpdir.join('generated', 'foo.rst').read()
+
+    generate.main(args)
+    assert capsys.readouterr().out.endswith('] 0 created, 0 updated, 1 unchanged\n')
+
+    assert generate.main(['-x', str(tmpdir.join('nonexistent')), str(src)]) == 1
+    assert 'nonexistent' in capsys.readouterr().err
+
+
+def test_split_module(tmpdir):
+    src = tmpdir.join('index.rst')
+    src.write('''
+.. autodoxysummary::
+   :toctree: generated/
+
+   foo
+''')
+    sphinxcontrib.autodoc_doxygen.setup.DOXYGEN_ROOT = ET.fromstring('''<root>
+  <compounddef id="namespacefoo" kind="namespace">
+    <compoundname>foo</compoundname>
+    <innerclass refid="structfoo_1_1t" prot="public">foo::t</innerclass>
+    <sectiondef kind="func">
+      <memberdef kind="function" id="namespacefoo_1a1"><name>a</name></memberdef>
+      <memberdef kind="function" id="namespacefoo_1a2"><name>b</name></memberdef>
+    </sectiondef>
+  </compounddef>
+  <compounddef id="structfoo_1_1t" kind="type">
+    <compoundname>foo::t</compoundname>
+  </compounddef>
+</root>''')
+
+    try:
+        status = generate.generate_autosummary_docs([str(src)], split=2)
+    finally:
+        del sphinxcontrib.autodoc_doxygen.setup.DOXYGEN_ROOT
+
+    generated = tmpdir.join('generated')
+    assert sorted(os.path.basename(fn) for fn in status) == ['foo-1.rst', 'foo-2.rst', 'foo.rst']
+    page = generated.join('foo.rst').read()
+    assert ':methods:' not in page and ':types:' not in page
+    assert '.. toctree::' in page and '      foo-2\n' in page
+    assert ':types: foo::t\n   :methods: a\n' in generated.join('foo-1.rst').read()
+    assert ':methods: b\n' in generated.join('foo-2.rst').read()
@@ -0,0 +1,528 @@
+"""Render a whole doxygen corpus to reST, to check that the faster ways of
+loading and rendering it give exactly the same output as the original
+implementation.
+
+Every object of the corpus goes through `format_xml_paragraph`, the
+documenters (``format_name``, ``format_signature``, ``get_doc`` and the
+whole ``generate`` output), ``DoxygenAutosummary.get_items``,
+``DoxygenAutoEnum.get_items`` and the stub templates, and the lines are
+compared with a line by line diff. The objects are listed with XPath over
+`get_doxygen_root`, and only the API the package had from the start is
+used, so that this file also renders a corpus with the original package.
+
+The tests compare each way of loading the bundled OpenMM corpus and a
+synthetic one with the output of the original package, checked in under
+``tests/golden``. To write those again, from a checkout of the first
+commit of the repository::
+
+    git worktree add /tmp/original $(git rev-list --max-parents=0 HEAD)
+    python tests/test_golden.py --write-golden /tmp/original
+
+Run this file directly to compare any two ``doxygen_xml`` settings (XML
+directories, archives or artifacts) before switching from one to the
+other::
+
+    python tests/test_golden.py path/to/xml path/to/doxygen.artifact
+"""
+from __future__ import print_function
+
+import contextlib
+import difflib
+import gzip
+import io
+import os
+import random
+import shutil
+import sys
+import tarfile
+import tempfile
+import zipfile
+from types import SimpleNamespace
+
+import pytest
+from docutils.statemachine import StringList
+from mock import Mock, patch
+from sphinx.ext.autodoc import ALL, Options
+
+if __name__ == '__main__' and sys.argv[1:2] == ['--write-golden'] and len(sys.argv) == 3:
+    # render with the package of the checkout given, whatever is installed
+    import sphinxcontrib
+    sphinxcontrib.__path__.insert(0, os.path.join(os.path.abspath(sys.argv[2]),
+                                                  'sphinxcontrib'))
+
+import sphinxcontrib.autodoc_doxygen
+import sphinxcontrib.autodoc_doxygen.autosummary as autosummary
+from sphinxcontrib.autodoc_doxygen import get_doxygen_root, set_doxygen_xml, setup
+from sphinxcontrib.autodoc_doxygen.autodoc import (
+    DoxygenMethodDocumenter, DoxygenModuleDocumenter, DoxygenTypeDocumenter)
+from sphinxcontrib.autodoc_doxygen.autosummary import DoxygenAutosummary, DoxygenAutoEnum
+from sphinxcontrib.autodoc_doxygen.autosummary.generate import generate_autosummary_docs
+from sphinxcontrib.autodoc_doxygen.xmlutils import format_xml_paragraph
+
+try:
+    from sphinxcontrib.autodoc_doxygen import load_doxygen_index
+except ImportError:
+    # the original package, see --write-golden
+    load_doxygen_index = None
+
+OPENMM = os.path.join(os.path.dirname(__file__), os.pardir,
+                      'examples', 'openmm-doxygen-xml.tar.bz2')
+GOLDEN = os.path.join(os.path.dirname(__file__), 'golden')
+
+REGISTRY = SimpleNamespace(
+    documenters=dict((cls.objtype, cls) for cls in (
+        DoxygenModuleDocumenter, DoxygenMethodDocumenter, DoxygenTypeDocumenter)),
+    autodoc_attrgetters={})
+
+# no other extension handles the autodoc events
+EVENTS = SimpleNamespace(emit=lambda *args, **kwargs: [],
+                         emit_firstresult=lambda *args, **kwargs: None)
+
+
+def _bridge(**options):
+    """A stand-in for the autodoc directive, collecting the generated lines."""
+    env = SimpleNamespace(
+        docname='index', temp_data={}, ref_context={}, config=Mock(),
+        current_document=Mock(), events=EVENTS, _registry=REGISTRY,
+        app=SimpleNamespace(registry=REGISTRY))
+    return SimpleNamespace(env=env, genopt=Options(members=ALL, **options), result=StringList(),
+                           warn=lambda msg: None, record_dependencies=set())
+
+
+class _Autosummary(DoxygenAutosummary):
+    # the documenters write to the directive's result, get_items reads the
+    # bridge's, like with the Sphinx versions where both are the same
+    result = property(lambda self: self.bridge.result)
+
+
+class _AutoEnum(DoxygenAutoEnum):
+    result = property(lambda self: self.bridge.result)
+
+
+def _autosummary(directive_class=_Autosummary, **options):
+    directive = directive_class.__new__(directive_class)
+    bridge = _bridge()
+    directive.state = SimpleNamespace(
+        document=SimpleNamespace(settings=SimpleNamespace(env=bridge.env)))
+    directive.options = options
+    directive.genopt = bridge.genopt
+    directive.bridge = bridge
+    directive.warn = lambda msg: None
+    return directive
+
+
+def _generated(documenter_class, name, options={}, **kwargs):
+    """The whole reST *documenter_class* generates for *name*."""
+    bridge = _bridge(**options)
+    documenter = documenter_class(bridge, name, **kwargs)
+    documenter.generate(real_modname=name)
+    return bridge.result.data
+
+
+def _compounds(root):
+    """The ``(refid, kind, name, compounddef)`` of the compounds listed
+    in ``index.xml``, sorted.
+    """
+    compounddefs = dict((node.get('id'), node) for node in root.iterfind('./compounddef'))
+    for refid, kind, name in sorted((node.get('refid'), node.get('kind'), node.findtext('name'))
+                                    for node in root.iterfind('./compound')):
+        if refid in compounddefs:
+            yield refid, kind, name, compounddefs[refid]
+
+
+def render_descriptions(root):
+    """Format every description of the corpus from its XML."""
+    for refid, kind, name, compound in _compounds(root):
+        for node in compound.iter('briefdescription', 'detaileddescription'):
+            yield '## %s %s %s' % (refid, node.getparent().get('id'), node.tag)
+            for line in format_xml_paragraph(node):
+                yield line
+
+
+def render_documenters(root):
+    """Document every namespace, type, enum and function of the corpus."""
+    for refid, kind, name, compound in _compounds(root):
+        if kind == 'namespace':
+            yield '## module %s' % name
+            for line in _generated(DoxygenModuleDocumenter, name,
+                                   options={'types': None, 'methods': None}):
+                yield line
+        elif kind == 'type':
+            yield '## type %s' % name
+            documenter = DoxygenTypeDocumenter(_bridge(), name, id=refid)
+            yield documenter.format_name()
+            for lines in documenter.get_doc():
+                for line in lines:
+                    yield line
+
+        for enum in compound.iterfind('./sectiondef/memberdef[@kind="enum"]'):
+            yield '## enum %s' % enum.get('id')
+            enum_name = '%s::%s' % (name, enum.findtext('name'))
+            with patch.object(autosummary, 'import_by_name',
+                              lambda name, env=None: (name, enum, name, '')):
+                items = _autosummary(_AutoEnum).get_items([enum_name])
+            for value, description in items:
+                yield value
+                for line in description:
+                    yield line
+
+        for member in compound.iterfind('./sectiondef/memberdef[@kind="function"]'):
+            for brief in (True, False):
+                documenter = DoxygenMethodDocumenter(_bridge(), 'x', id=member.get('id'),
+                                                     brief=brief, parent=compound)
+                yield '## method %s %s' % (member.get('id'), brief)
+                yield documenter.format_name()
+                yield documenter.format_signature()
+                for lines in documenter.get_doc():
+                    for line in lines:
+                        yield line
+            yield '## method %s generated' % member.get('id')
+            for line in _generated(DoxygenMethodDocumenter, 'x', id=member.get('id'),
+                                   parent=compound):
+                yield line
+
+
+def render_autosummary(root):
+    """Summarize every compound and function of the corpus."""
+    compounds = {}
+    for refid, kind, name, compound in _compounds(root):
+        if kind not in ('page', 'file', 'dir'):
+            compounds.setdefault(name, compound)
+    names = sorted(compounds)
+    for compound_name in list(names):
+        names.extend(compound_name + '::' + member.findtext('name') for member in
+                     compounds[compound_name].iterfind(
+                         './sectiondef[@kind="func"]/memberdef[@kind="function"]'))
+
+    yield '## autosummary'
+    for item in _autosummary().get_items(names):
+        yield repr(item)
+    yield '## autosummary generate'
+    for item in _autosummary(generate=True, kind='mod').get_items([]):
+        yield repr(item)
+
+
+def render_stubs(root, jobs=1):
+    """Generate the autosummary stubs of every namespace, class and page."""
+    # (the original package has no template for derived types)
+    names = sorted(name for refid, kind, name, compound in _compounds(root)
+                   if kind in ('namespace', 'class', 'struct'))
+    tmp = tempfile.mkdtemp()
+    try:
+        src = os.path.join(tmp, 'index.rst')
+        with open(src, 'w') as f:
+            f.write('.. autodoxysummary::\n   :toctree: generated/\n\n')
+            f.writelines('   %s\n' % name for name in names)
+            f.write('\n.. autodoxysummary::\n   :toctree: pages/\n   :generate:\n'
+                    '   :kind: page\n')
+        with contextlib.redirect_stdout(io.StringIO()):
+            if jobs == 1:
+                generate_autosummary_docs([src])
+            else:
+                generate_autosummary_docs([src], jobs=jobs)
+
+        for dirname in ('generated', 'pages'):
+            path = os.path.join(tmp, dirname)
+            for filename in sorted(os.listdir(path)) if os.path.isdir(path) else ():
+                yield '## stub %s/%s' % (dirname, filename)
+                with open(os.path.join(path, filename)) as f:
+                    # without the timestamp comment at the end
+                    text = f.read().rpartition('\n..\n   ')[0]
+                for line in text.splitlines():
+                    yield line
+    finally:
+        shutil.rmtree(tmp)
+
+
+def render(doxygen_xml, jobs=1, watch=False):
+    """Load *doxygen_xml* and render the whole corpus, as a list of lines.
+
+    *jobs* is passed on to the stub generator and *watch* to the loader.
+    """
+    if load_doxygen_index is None:
+        set_doxygen_xml(SimpleNamespace(config=SimpleNamespace(doxygen_xml=doxygen_xml)))
+    else:
+        load_doxygen_index(doxygen_xml, watch=watch)
+    try:
+        root = get_doxygen_root()
+        lines = []
+        for part in (render_descriptions(root), render_documenters(root),
+                     render_autosummary(root), render_stubs(root, jobs)):
+            lines.extend(part)
+        # some lines hold several, as in the golden files
+        return '\n'.join(lines).split('\n')
+    finally:
+        for name in ('DOXYGEN_ROOT', 'DOXYGEN_INDEX'):
+            if hasattr(setup, name):
+                delattr(setup, name)
+
+
+def diff(reference, other):
+    """The line by line differences between two renderings, or an empty
+    list if they are identical.
+    """
+    return list(difflib.unified_diff(reference, other, 'reference', 'other',
+                                     lineterm='', n=2))
+
+
+def assert_identical(reference, other):
+    changes = diff(reference, other)
+    assert not changes, '\n'.join(changes[:200])
+
+
+def synthetic_corpus(directory, namespaces=4, functions=12, seed=0):
+    """Write a made-up doxygen XML corpus of Fortran-like modules to
+    *directory*, using every kind of markup the formatter knows about.
+    """
+    rng = random.Random(seed)
+    words = ('the', 'force', 'of', 'each', 'particle', 'is', 'computed', 'from',
+             'a', 'cutoff', 'value', 'and', 'step', 'size')
+
+    def text(n):
+        return ' '.join(rng.choice(words) for _ in range(n))
+
+    def sentence():
+        return text(rng.randint(3, 9)).capitalize() + '.'
+
+    def para(ref_ids):
+        markup = [sentence()]
+        for _ in range(rng.randint(0, 3)):
+            markup.append(rng.choice([
+                '<emphasis>%s</emphasis>' % text(2),
+                '<computeroutput>%s</computeroutput>' % text(1),
+                '<ulink url="https://example.org/%d">%s</ulink>' % (rng.randint(0, 9), text(2)),
+                '<formula id="0">$x^%d$</formula>' % rng.randint(2, 4),
+                '<ref refid="%s" kindref="member">%s</ref>' % (rng.choice(ref_ids), text(1)),
+                '<superscript>%d</superscript>' % rng.randint(1, 9),
+            ]))
+            markup.append(sentence())
+        return '<para>%s</para>' % ' '.join(markup)
+
+    def detailed(ref_ids):
+        blocks = [para(ref_ids) for _ in range(rng.randint(0, 3))]
+        if rng.random() < 0.5:
+            blocks.append(
+                '<para><parameterlist kind="param">%s</parameterlist></para>' % ''.join(
+                    '<parameteritem><parameternamelist><parametername direction="in">'
+                    'arg%d</parametername></parameternamelist><parameterdescription>%s'
+                    '</parameterdescription></parameteritem>' % (i, para(ref_ids))
+                    for i in range(rng.randint(1, 3))))
+        if rng.random() < 0.3:
+            blocks.append('<para><simplesect kind="return">%s</simplesect></para>'
+                          % para(ref_ids))
+        if rng.random() < 0.3:
+            blocks.append('<para><itemizedlist>%s</itemizedlist></para>' % ''.join(
+                '<listitem>%s</listitem>' % para(ref_ids) for _ in range(rng.randint(1, 3))))
+        if rng.random() < 0.2:
+            blocks.append('<para><programlisting><codeline><highlight>call %s()'
+                          '</highlight></codeline></programlisting></para>' % text(1))
+        if rng.random() < 0.2:
+            blocks.append(
+                '<para><table rows="2" cols="2"><row><entry thead="yes">%s</entry>'
+                '<entry thead="yes">%s</entry></row><row><entry thead="no">%s</entry>'
+                '<entry thead="no">%s</entry></row></table></para>'
+                % tuple(para(ref_ids) for _ in range(4)))
+        if rng.random() < 0.2:
+            blocks.append('<para><xrefsect id="todo_1"><xreftitle>Todo</xreftitle>'
+                          '<xrefdescription>%s</xrefdescription></xrefsect></para>'
+                          % para(ref_ids))
+        return '<detaileddescription>%s</detaileddescription>' % ''.join(blocks)
+
+    compounds = []
+    for n in range(namespaces):
+        name = 'mod%d' % n
+        refid = 'namespace' + name
+        function_ids = ['%s_1a%d' % (refid, i) for i in range(functions)]
+        members = []
+        for i, member_id in enumerate(function_ids):
+            if rng.random() < 0.5:
+                typefield = 'subroutine'
+            else:
+                typefield = '%s function' % rng.choice(('real', 'integer', 'logical'))
+            members.append(
+                '<memberdef kind="function" id="%s"><type>%s</type>'
+                '<definition>%s %s::f%d</definition><argsstring>(%s)</argsstring>'
+                '<name>f%d</name><briefdescription>%s</briefdescription>%s</memberdef>'
+                % (member_id, typefield, typefield, name, i,
+                   ', '.join('arg%d' % a for a in range(rng.randint(0, 3))), i,
+                   para(function_ids) if rng.random() < 0.8 else '',
+                   detailed(function_ids)))
+        enum = ('<memberdef kind="enum" id="%s_1e0"><name>kind</name>%s</memberdef>'
+                % (refid, ''.join(
+                    '<enumvalue id="%s_1e0v%d"><name>value%d</name>'
+                    '<detaileddescription>%s</detaileddescription></enumvalue>'
+                    % (refid, v, v, para(function_ids)) for v in range(3))))
+        type_id = 'type%s_1_1t' % name
+        compounds.append((refid, 'namespace', name,
+                          '<innerclass refid="%s">%s::t</innerclass>'
+                          '<sectiondef kind="func">%s</sectiondef>'
+                          '<sectiondef kind="enum">%s</sectiondef>'
+                          '<briefdescription>%s</briefdescription>%s'
+                          % (type_id, name, ''.join(members), enum,
+                             para(function_ids), detailed(function_ids))))
+        fields = []
+        for v in range(rng.randint(1, 5)):
+            attributes = [rng.choice(('real', 'integer', 'character(len=8)',
+                                      'type(<ref refid="%s" kindref="compound">t</ref>)'
+                                      % type_id))]
+            attributes += rng.sample(('dimension(:)', 'dimension(:,:)', 'pointer',
+                                      'allocatable', 'target'), rng.randint(0, 2))
+            fields.append(
+                '<memberdef kind="variable" id="%s_1v%d" prot="%s"><type>%s</type>'
+                '<name>x%d</name><briefdescription>%s</briefdescription></memberdef>'
+                % (type_id, v, rng.choice(('public', 'public', 'private')),
+                   ', '.join(attributes), v, para(function_ids) if rng.random() < 0.7 else ''))
+        compounds.append((type_id, 'type', name + '::t',
+                          '<sectiondef kind="public-attrib">%s</sectiondef>'
+                          '<briefdescription>%s</briefdescription>'
+                          % (''.join(fields), para(function_ids))))
+    compounds.append(('intro', 'page', 'intro',
+                      '<title>Introduction</title><briefdescription/>%s'
+                      % detailed(['namespacemod0_1a0'])))
+
+    index = ['<doxygenindex>']
+    for refid, kind, name, body in compounds:
+        index.append('<compound refid="%s" kind="%s"><name>%s</name></compound>'
+                     % (refid, kind, name))
+        with open(os.path.join(directory, refid + '.xml'), 'w') as f:
+            f.write('<doxygen><compounddef id="%s" kind="%s"><compoundname>%s'
+                    '</compoundname>%s</compounddef></doxygen>' % (refid, kind, name, body))
+    index.append('</doxygenindex>')
+    with open(os.path.join(directory, 'index.xml'), 'w') as f:
+        f.write(''.join(index))
+
+
+CORPORA = ('openmm', 'synthetic')
+
+
+def write_corpus(name, xml):
+    """Write the XML of the corpus *name* to the directory *xml*."""
+    if name == 'openmm':
+        with tarfile.open(OPENMM) as tar:
+            for member in tar.getmembers():
+                if member.isfile() and member.name.endswith('.xml'):
+                    member.name = os.path.basename(member.name)
+                    tar.extract(member, xml)
+    else:
+        synthetic_corpus(xml)
+
+
+def golden_filename(name):
+    return os.path.join(GOLDEN, name + '.txt.gz')
+
+
+def read_golden(name):
+    """The rendering of the corpus *name* by the original package."""
+    with gzip.open(golden_filename(name), 'rt', encoding='utf-8') as f:
+        return f.read().split('\n')
+
+
+def write_golden(name, lines):
+    os.makedirs(GOLDEN, exist_ok=True)
+    # no timestamp in the header, so that the file only changes with its content
+    with open(golden_filename(name), 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb', filename='', mtime=0) as f:
+            f.write('\n'.join(lines).encode('utf-8'))
+
+
+@pytest.fixture(scope='module', params=CORPORA)
+def corpus(request, tmpdir_factory):
+    """The XML directory of a corpus, with the original rendering of it."""
+    xml = tmpdir_factory.mktemp(request.param).mkdir('xml')
+    write_corpus(request.param, str(xml))
+    return str(xml), read_golden(request.param)
+
+
+def test_golden_is_complete(corpus):
+    xml, reference = corpus
+    # every kind of output made it into the rendering
+    markers = ['## module ', '## method ', '## autosummary', '## stub generated/']
+    if any(line.startswith('## module mod0') for line in reference):
+        # the synthetic corpus also has derived types and enums
+        markers += ['## type ', '## enum ']
+    for marker in markers:
+        assert any(line.startswith(marker) for line in reference), marker
+
+
+def test_directory(corpus):
+    xml, reference = corpus
+    assert_identical(reference, render(xml))
+
+
+def test_artifact(corpus, tmpdir):
+    xml, reference = corpus
+    from sphinxcontrib.autodoc_doxygen.artifact import compile_artifact
+
+    artifact = str(tmpdir.join('doxygen.artifact'))
+    compile_artifact(xml, artifact)
+    assert_identical(reference, render(artifact))
+
+
+@pytest.mark.parametrize('suffix', ['.tar.gz', '.zip'])
+def test_archive(corpus, tmpdir, suffix):
+    xml, reference = corpus
+    archive = str(tmpdir.join('xml' + suffix))
+    if suffix == '.zip':
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as z:
+            for filename in sorted(os.listdir(xml)):
+                z.write(os.path.join(xml, filename), os.path.join('xml', filename))
+    else:
+        with tarfile.open(archive, 'w:gz') as tar:
+            tar.add(xml, 'xml')
+    assert_identical(reference, render(archive))
+
+
+def test_parallel_stubs(corpus):
+    xml, reference = corpus
+    assert_identical(reference, render(xml, jobs=2))
+
+
+def test_watcher(corpus):
+    xml, reference = corpus
+    assert_identical(reference, render(xml, watch=True))
+
+    # the index patched up from a single changed file
+    filename = os.path.join(xml, sorted(os.listdir(xml))[-1])
+    os.utime(filename, (0, 0))
+    try:
+        assert_identical(reference, render(xml, watch=True))
+    finally:
+        sphinxcontrib.autodoc_doxygen._watchers.clear()
+
+
+def test_diff():
+    assert diff(['a', 'b'], ['a', 'b']) == []
+    changes = [line for line in diff(['a', 'b', 'c'], ['a', 'x', 'c'])
+               if line[:1] in '+-' and line[:3] not in ('+++', '---')]
+    assert changes == ['-b', '+x']
+
+
+def main(argv=sys.argv[1:]):
+    if argv[:1] == ['--write-golden'] and len(argv) <= 2:
+        for name in CORPORA:
+            tmp = tempfile.mkdtemp()
+            try:
+                write_corpus(name, tmp)
+                lines = render(tmp)
+            finally:
+                shutil.rmtree(tmp)
+            write_golden(name, lines)
+            print('%s: %d lines, rendered by %s' % (golden_filename(name), len(lines),
+                                                    sphinxcontrib.autodoc_doxygen.__file__),
+                  file=sys.stderr)
+        return 0
+    if len(argv) != 2:
+        print('usage: %s REFERENCE_XML OTHER_XML\n       %s --write-golden [CHECKOUT]'
+              % (sys.argv[0], sys.argv[0]), file=sys.stderr)
+        return 2
+    reference, other = render(argv[0]), render(argv[1])
+    changes = diff(reference, other)
+    for line in changes:
+        print(line)
+    print('%d lines rendered, %s' % (len(reference), 'different' if changes else 'identical'),
+          file=sys.stderr)
+    return 1 if changes else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
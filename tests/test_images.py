@@ -0,0 +1,52 @@
+import os
+
+import lxml.etree as ET
+
+from sphinxcontrib.autodoc_doxygen.images import copy_images
+from sphinxcontrib.autodoc_doxygen.index import DoxygenIndex
+
+
+def test_index_images():
+    index = DoxygenIndex.from_root(ET.fromstring('''<root>
+  <compounddef id="namespacefoo" kind="namespace">
+    <compoundname>foo</compoundname>
+    <detaileddescription>
+      <para><image type="html" name="b.png">A caption</image></para>
+      <para><image type="latex" name="b.png"></image><image type="html" name="a.svg"/></para>
+    </detaileddescription>
+  </compounddef>
+</root>'''))
+    assert index.images == ('a.svg', 'b.png')
+
+
+def test_copy_images(tmpdir):
+    source, target = tmpdir.mkdir('html'), tmpdir.join('src', 'images')
+    manifest = str(tmpdir.join('manifest.pickle'))
+    source.join('a.png').write_binary(b'a')
+    source.join('b.png').write_binary(b'b')
+    source.join('unused.png').write_binary(b'unused')
+
+    def sync(*names):
+        return copy_images(names, str(source), str(target), manifest)
+
+    # only the referenced images are copied
+    assert sync('a.png', 'b.png', 'gone.png') == (['a.png', 'b.png'], [], ['gone.png'])
+    assert sorted(os.listdir(str(target))) == ['a.png', 'b.png']
+
+    os.utime(str(target.join('a.png')), (0, 0))
+    os.utime(str(target.join('b.png')), (0, 0))
+
+    # nothing is written again, even if doxygen rewrote the same content
+    source.join('a.png').write_binary(b'a')
+    assert sync('a.png', 'b.png') == ([], ['a.png', 'b.png'], [])
+    assert target.join('a.png').mtime() == 0
+
+    # but changed images are
+    source.join('b.png').write_binary(b'bb')
+    assert sync('a.png', 'b.png') == (['b.png'], ['a.png'], [])
+    assert target.join('b.png').read_binary() == b'bb'
+
+    # and so are images removed from the target, without the manifest too
+    target.join('a.png').remove()
+    assert copy_images(['a.png', '../escape.png'], str(source), str(target)) == \
+        (['a.png'], [], ['../escape.png'])
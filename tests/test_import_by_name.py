@@ -0,0 +1,38 @@
+import lxml.etree as ET
+from mock import patch
+
+import sphinxcontrib.autodoc_doxygen
+from sphinxcontrib.autodoc_doxygen import autosummary
+from sphinxcontrib.autodoc_doxygen.autosummary import import_by_names
+
+
+CORPUS = '''<root>
+  <compounddef id="namespacefoo" kind="namespace">
+    <compoundname>foo</compoundname>
+    <sectiondef kind="func">
+      <memberdef kind="function" id="namespacefoo_1a1"><name>baz</name></memberdef>
+      <memberdef kind="function" id="namespacefoo_1a2"><name>baz</name></memberdef>
+      <memberdef kind="function" id="namespacefoo_1a3"><name>qux</name></memberdef>
+    </sectiondef>
+  </compounddef>
+</root>'''
+
+
+def test_import_by_names():
+    sphinxcontrib.autodoc_doxygen.setup.DOXYGEN_ROOT = ET.fromstring(CORPUS)
+    try:
+        names = ['foo::baz', 'foo::baz', '~foo::qux', 'qux', 'qux', 'nope']
+        results = import_by_names(names, prefixes=[None, 'foo'])
+
+        # consecutive names are successive overloads
+        assert [r[1].get('id') if r else None for r in results] == [
+            'namespacefoo_1a1', 'namespacefoo_1a2', 'namespacefoo_1a3',
+            'namespacefoo_1a3', None, None]
+
+        # names that failed with a prefix are not looked up again
+        with patch.object(autosummary, '_import_by_name',
+                          wraps=autosummary._import_by_name) as lookup:
+            import_by_names(['nope', 'qux'], prefixes=[None, 'foo'])
+            assert [c[0][0] for c in lookup.call_args_list] == ['foo::qux']
+    finally:
+        del sphinxcontrib.autodoc_doxygen.setup.DOXYGEN_ROOT
@@ -0,0 +1,63 @@
+"""Keep importing the extension cheap.
+
+Run this file directly to print how long importing the extension, and
+setting it up, takes (from ``python -X importtime``).
+"""
+from __future__ import print_function
+
+import subprocess
+import sys
+
+# cumulative time, in microseconds, that importing the package may take
+IMPORT_BUDGET = 100000
+
+IMPORT = 'import sphinxcontrib.autodoc_doxygen'
+SETUP = IMPORT + '''
+from mock import Mock
+sphinxcontrib.autodoc_doxygen.setup(Mock())
+'''
+
+
+def import_times(code):
+    """Run *code* in a fresh interpreter and return a dict mapping each
+    module it imported to the cumulative time that took, in microseconds.
+    """
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            stderr=subprocess.PIPE, check=True,
+                            universal_newlines=True).stderr
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_time, cumulative, name = line[len('import time:'):].split('|')
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_import_is_lazy():
+    times = import_times(IMPORT)
+
+    assert times['sphinxcontrib.autodoc_doxygen'] < IMPORT_BUDGET
+    for module in ('lxml.etree', 'jinja2', 'sphinx.ext.autodoc', 'sphinx.ext.autosummary',
+                   'sphinxcontrib.autodoc_doxygen.index'):
+        assert module not in times
+
+
+def test_setup_does_not_import_the_generator():
+    times = import_times(SETUP)
+
+    assert 'sphinxcontrib.autodoc_doxygen.autodoc' in times
+    for module in ('sphinxcontrib.autodoc_doxygen.autosummary.generate', 'multiprocessing'):
+        assert module not in times
+
+
+if __name__ == '__main__':
+    runs = 5
+    for title, code, modules in (
+            ('import', IMPORT, ['sphinxcontrib.autodoc_doxygen']),
+            ('setup', SETUP, ['sphinxcontrib.autodoc_doxygen.autodoc',
+                              'sphinxcontrib.autodoc_doxygen.autosummary'])):
+        best = min(sum(import_times(code)[module] for module in modules)
+                   for _ in range(runs))
+        print('%-8s %8.1f ms (best of %d)' % (title, best / 1000., runs))
@@ -0,0 +1,454 @@
+import os
+import pytest
+import lxml.etree as ET
+from sphinxcontrib.autodoc_doxygen.index import DoxygenIndex, DoxygenTagIndex
+
+
+CORPUS = '''<root>
+  <compound refid="namespacefoo" kind="namespace"><name>foo</name></compound>
+  <compound refid="indexpage" kind="page"><name>index</name></compound>
+  <compound refid="usage" kind="page"><name>usage</name></compound>
+  <compounddef id="namespacefoo" kind="namespace">
+    <compoundname>foo</compoundname>
+    <innerclass refid="structfoo_1_1bar" prot="public">foo::bar</innerclass>
+    <sectiondef kind="enum">
+      <memberdef kind="enum" id="namespacefoo_1e1">
+        <name>colour</name>
+        <enumvalue id="namespacefoo_1e1a"><name>red</name>
+          <detaileddescription><para>Like <emphasis>blood</emphasis>.</para></detaileddescription>
+        </enumvalue>
+        <enumvalue id="namespacefoo_1e1b"><name>blue</name>
+          <detaileddescription></detaileddescription>
+        </enumvalue>
+      </memberdef>
+    </sectiondef>
+    <sectiondef kind="func">
+      <memberdef kind="function" id="namespacefoo_1a1">
+        <definition>subroutine foo::baz</definition>
+        <argsstring>(x)</argsstring>
+        <name>baz</name>
+      </memberdef>
+    </sectiondef>
+  </compounddef>
+  <compounddef id="structfoo_1_1bar" kind="type">
+    <compoundname>foo::bar</compoundname>
+  </compounddef>
+</root>'''
+
+
+def test_lookups():
+    index = DoxygenIndex.from_root(ET.fromstring(CORPUS))
+
+    assert len(index) == 5
+    assert index.compound('structfoo_1_1bar').findtext('compoundname') == 'foo::bar'
+    assert index.compound('nope') is None
+    assert [c.get('id') for c in index.compounds_by_name('foo')] == ['namespacefoo']
+    assert index.member('namespacefoo_1a1').findtext('name') == 'baz'
+    assert index.member('namespacefoo') is None
+    assert index.find_id('namespacefoo').tag == 'compounddef'
+    assert index.compounds_of_kind('namespace') == ('foo',)
+    assert index.compounds_of_kind('page') == ('index', 'usage')
+    assert index.pages == ('usage',)
+    assert index.compound_kind('structfoo_1_1bar') == 'type'
+    assert index.member_fullname('namespacefoo_1a1') == 'foo::baz'
+    assert index.member_typefield('namespacefoo_1a1') == 'subroutine'
+    assert index.member_fullname('namespacefoo_1e1') is None
+
+    # names are only stored once, and are not mistaken for ids
+    assert index.compound_name('namespacefoo') is index.compounds_of_kind('namespace')[0]
+    assert index.compound('foo') is None and not index.has_id('subroutine')
+
+
+def test_method_documenter():
+    from mock import Mock
+    from sphinxcontrib.autodoc_doxygen import setup
+    from sphinxcontrib.autodoc_doxygen.autodoc import DoxygenMethodDocumenter
+
+    setup.DOXYGEN_INDEX = index = DoxygenIndex.from_root(ET.fromstring(CORPUS))
+    try:
+        compound = index.compound('namespacefoo')
+        for parent in (None, compound, ET.fromstring(CORPUS).find('compounddef')):
+            documenter = DoxygenMethodDocumenter(Mock(), 'baz', id='namespacefoo_1a1',
+                                                 parent=parent)
+            assert documenter.fullname == 'foo::baz'
+            assert documenter.get_typefield() == 'subroutine'
+            expected = compound if parent is None else parent
+            assert documenter.object.getparent().getparent() is expected
+    finally:
+        del setup.DOXYGEN_INDEX
+
+
+def test_enum_values():
+    index = DoxygenIndex.from_root(ET.fromstring(CORPUS))
+
+    values = index.enum_values('namespacefoo_1e1')
+    assert values == (('red', ('', 'Like', '*blood*', '.', '')), ('blue', ('',)))
+    assert index.enum_values('namespacefoo_1e1') is values
+    assert index.enum_values('namespacefoo_1a1') is None
+
+
+def test_parsed_cache_is_per_process():
+    index = DoxygenIndex.from_root(ET.fromstring(CORPUS))
+    node = index.compound('namespacefoo')
+    assert index.compound('namespacefoo') is node
+
+    # pretend we are a freshly forked worker
+    index._pid = -1
+    assert index.compound('namespacefoo') is not node
+
+
+TAGFILE = b'''<?xml version='1.0' encoding='UTF-8' standalone='yes' ?>
+<tagfile>
+  <compound kind="page">
+    <name>index</name>
+    <title></title>
+    <filename>index.html</filename>
+  </compound>
+  <compound kind="namespace">
+    <name>foo</name>
+    <filename>namespacefoo.html</filename>
+    <class kind="struct">foo::bar</class>
+    <member kind="function">
+      <type>subroutine</type>
+      <name>baz</name>
+      <anchorfile>namespacefoo.html</anchorfile>
+      <anchor>a1</anchor>
+      <arglist>(x)</arglist>
+    </member>
+  </compound>
+  <compound kind="type">
+    <name>foo::bar</name>
+    <filename>structfoo_1_1bar.html</filename>
+  </compound>
+</tagfile>
+'''
+
+
+def test_tagfile(tmpdir):
+    tagfile = tmpdir.join('foo.tag')
+    tagfile.write_binary(TAGFILE)
+    loaded = []
+
+    def load_xml():
+        loaded.append(True)
+        return DoxygenIndex.from_root(ET.fromstring(CORPUS))
+
+    index = DoxygenTagIndex.from_file(str(tagfile), load_xml)
+
+    assert index.compounds_of_kind('namespace') == ('foo',)
+    assert index.pages == ()
+    assert index.compound_kind('structfoo_1_1bar') == 'type'
+    assert index.compound_name('namespacefoo') == 'foo'
+    assert index.member_name('namespacefoo_1a1') == 'baz'
+    assert index.has_name('foo::baz') and not index.has_name('foo::nope')
+    assert not loaded
+
+    # descriptions need the XML
+    assert index.compound('namespacefoo').findtext('compoundname') == 'foo'
+    assert loaded == [True]
+
+
+def test_tagfile_filter(tmpdir):
+    from sphinxcontrib.autodoc_doxygen import setup
+    from sphinxcontrib.autodoc_doxygen.index import CompoundFilter
+    from sphinxcontrib.autodoc_doxygen.xmlutils import format_xml_paragraph
+
+    tagfile = tmpdir.join('foo.tag')
+    tagfile.write_binary(TAGFILE.replace(b'</member>', b"""</member>
+    <member kind="function" protection="private">
+      <type>subroutine</type>
+      <name>hidden</name>
+      <anchorfile>namespacefoo.html</anchorfile>
+      <anchor>a2</anchor>
+    </member>"""))
+    loaded = []
+
+    index = DoxygenTagIndex.from_file(
+        str(tagfile), lambda: loaded.append(True),
+        CompoundFilter(exclude_kinds=['type'], exclude_prot=['private']))
+
+    assert index.compounds_of_kind('type') == ()
+    assert index.compound_kind('structfoo_1_1bar') is None
+    assert index.is_excluded('structfoo_1_1bar')
+    assert index.member_name('namespacefoo_1a1') == 'baz'
+    assert index.member_name('namespacefoo_1a2') is None and not index.has_name('foo::hidden')
+    assert index.is_excluded('namespacefoo_1a2') and not index.is_excluded('namespacefoo_1a1')
+
+    # references to them are plain text, without loading the XML
+    setup.DOXYGEN_INDEX = index
+    try:
+        text = format_xml_paragraph(ET.fromstring(
+            '<detaileddescription><para>See <ref refid="structfoo_1_1bar" kindref="compound">'
+            'bar</ref> and <ref refid="namespacefoo_1a2" kindref="member">hidden</ref>.'
+            '</para></detaileddescription>'))
+    finally:
+        del setup.DOXYGEN_INDEX
+    assert ' '.join(' '.join(text).split()) == 'See bar and hidden.'
+    assert not loaded
+
+
+def test_artifact(tmpdir):
+    from sphinx.errors import ExtensionError
+    from sphinxcontrib.autodoc_doxygen import setup
+    from sphinxcontrib.autodoc_doxygen.artifact import read_artifact, write_artifact
+
+    setup.DOXYGEN_INDEX = index = DoxygenIndex.from_root(ET.fromstring(CORPUS))
+    try:
+        index.prerender_descriptions()
+    finally:
+        del setup.DOXYGEN_INDEX
+    filename = str(tmpdir.join('doxygen.artifact'))
+    write_artifact(index, filename)
+
+    loaded = read_artifact(filename)
+    assert loaded.signature == index.signature
+    assert loaded.compound_name('namespacefoo') == 'foo'
+    assert loaded.rendered_description('namespacefoo_1e1a', 'detaileddescription') == \
+        ('', 'Like', '*blood*', '.', '')
+    assert loaded.compound('structfoo_1_1bar').findtext('compoundname') == 'foo::bar'
+
+    with open(filename, 'r+b') as f:
+        f.seek(-1, 2)
+        f.write(b'!')
+    with pytest.raises(ExtensionError):
+        read_artifact(filename)
+
+
+def test_watcher(tmpdir):
+    from sphinxcontrib.autodoc_doxygen.index import DoxygenXmlWatcher
+
+    root = ET.fromstring(CORPUS)
+    files = []
+    for i, node in enumerate(root.findall('compounddef')):
+        filename = tmpdir.join('%d.xml' % i)
+        filename.write_binary(ET.tostring(node))
+        files.append(str(filename))
+
+    watcher = DoxygenXmlWatcher()
+    index = watcher.load(files)
+    assert watcher.load(files) is index
+    assert index.compounds_by_name('foo::bar')[0].get('id') == 'structfoo_1_1bar'
+
+    tmpdir.join('1.xml').write_binary(
+        ET.tostring(root.findall('compounddef')[1]).replace(b'foo::bar', b'foo::qux'))
+    os.utime(files[1], ns=(0, 0))
+    changed = watcher.load(files)
+    assert changed is not index
+    assert changed.compounds_by_name('foo::bar') == []
+    assert changed.compounds_by_name('foo::qux')[0].get('id') == 'structfoo_1_1bar'
+    assert changed.member('namespacefoo_1a1').findtext('name') == 'baz'
+    assert changed.enum_values('namespacefoo_1e1')[0][0] == 'red'
+
+
+@pytest.mark.parametrize('suffix', ['.tar.gz', '.zip'])
+def test_archive(tmpdir, suffix):
+    import tarfile
+    import zipfile
+    from sphinxcontrib.autodoc_doxygen import load_doxygen_xml
+
+    root = ET.fromstring(CORPUS)
+    members = [('xml/%d.xml' % i, ET.tostring(node))
+               for i, node in enumerate(root.findall('compounddef'))]
+    members.append(('xml/._0.xml', b'\0\5\26\7'))  # resource forks are skipped
+    filename = str(tmpdir.join('doxygen' + suffix))
+    if suffix == '.zip':
+        with zipfile.ZipFile(filename, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for name, data in members:
+                archive.writestr(name, data)
+    else:
+        for name, data in members:
+            tmpdir.join(name).write_binary(data, ensure=True)
+        with tarfile.open(filename, 'w:gz') as archive:
+            archive.add(str(tmpdir.join('xml')), 'xml')
+
+    index = load_doxygen_xml(filename)
+    assert index.compound_kind('structfoo_1_1bar') == 'type'
+    assert index.member('namespacefoo_1a1').findtext('name') == 'baz'
+
+
+@pytest.mark.parametrize('compression', ['ZIP_DEFLATED', 'ZIP_LZMA'])
+def test_corrupt_archive(tmpdir, compression):
+    import struct
+    import threading
+    import zipfile
+    from sphinx.errors import ExtensionError
+    from sphinxcontrib.autodoc_doxygen import load_doxygen_xml
+
+    filename = str(tmpdir.join('doxygen.zip'))
+    with zipfile.ZipFile(filename, 'w', getattr(zipfile, compression)) as archive:
+        archive.writestr('xml/0.xml', CORPUS * 10)
+        info = archive.infolist()[0]
+
+    # garble the start of the compressed data (past the LZMA properties)
+    with open(filename, 'r+b') as f:
+        f.seek(info.header_offset + 26)
+        name_size, extra_size = struct.unpack('<HH', f.read(4))
+        f.seek(info.header_offset + 30 + name_size + extra_size + 4)
+        f.write(b'\xff' * 8)
+
+    threads = set(threading.enumerate())
+    with pytest.raises(ExtensionError, match='Cannot read doxygen archive'):
+        load_doxygen_xml(filename)
+    assert set(threading.enumerate()) <= threads
+
+
+def test_type_fields():
+    index = DoxygenIndex.from_root(ET.fromstring('''<root>
+  <compounddef id="typefoo_1_1bar" kind="type">
+    <compoundname>foo::bar</compoundname>
+    <sectiondef kind="public-attrib">
+      <memberdef kind="variable" id="typefoo_1_1bar_1a1" prot="public">
+        <type>real, dimension(:,:), pointer</type>
+        <name>x</name>
+        <briefdescription><para>The positions.</para></briefdescription>
+      </memberdef>
+      <memberdef kind="variable" id="typefoo_1_1bar_1a2" prot="private">
+        <type><ref refid="typefoo_1_1bar" kindref="compound">bar</ref></type>
+        <name>next</name>
+        <briefdescription></briefdescription>
+      </memberdef>
+    </sectiondef>
+  </compounddef>
+</root>'''))
+
+    assert index.type_fields('typefoo_1_1bar') == (
+        ('x', 'real', '(:,:)', ('pointer',), False, 'The positions.'),
+        ('next', 'bar', '', (), True, None))
+    assert index.type_fields('typefoo_1_1bar_1a1') is None
+
+
+FILTERED = {
+    'index.xml': '''<doxygenindex>
+  <compound refid="namespacefoo" kind="namespace"><name>foo</name>
+    <member refid="namespacefoo_1a1" kind="function"><name>baz</name></member>
+  </compound>
+  <compound refid="classfoo_1_1widget" kind="class"><name>foo::widget</name>
+    <member refid="classfoo_1_1widget_1a1" kind="function"><name>draw</name></member>
+    <member refid="classfoo_1_1widget_1a2" kind="function"><name>reset</name></member>
+  </compound>
+  <compound refid="foo_8h" kind="file"><name>foo.h</name>
+    <member refid="foo_8h_1a1" kind="define"><name>FOO</name></member>
+  </compound>
+</doxygenindex>''',
+    'namespacefoo.xml': '''<doxygen><compounddef id="namespacefoo" kind="namespace">
+    <compoundname>foo</compoundname>
+    <innerclass refid="classfoo_1_1widget" prot="public">foo::widget</innerclass>
+    <sectiondef kind="func">
+      <memberdef kind="function" id="namespacefoo_1a1" prot="public">
+        <name>baz</name>
+        <detaileddescription><para>See <ref refid="classfoo_1_1widget_1a2" kindref="member">reset</ref> and <ref refid="foo_8h_1a1" kindref="member">FOO</ref>.</para></detaileddescription>
+      </memberdef>
+    </sectiondef>
+  </compounddef></doxygen>''',
+    'classfoo_1_1widget.xml': '''<doxygen><compounddef id="classfoo_1_1widget" kind="class">
+    <compoundname>foo::widget</compoundname>
+    <sectiondef kind="public-func">
+      <memberdef kind="function" id="classfoo_1_1widget_1a1" prot="public"><name>draw</name></memberdef>
+    </sectiondef>
+    <sectiondef kind="private-func">
+      <memberdef kind="function" id="classfoo_1_1widget_1a2" prot="private"><name>reset</name></memberdef>
+    </sectiondef>
+  </compounddef></doxygen>''',
+    'foo_8h.xml': '''<doxygen><compounddef id="foo_8h" kind="file">
+    <compoundname>foo.h</compoundname>
+  </compounddef></doxygen>''',
+}
+
+
+def test_compound_filter(tmpdir, monkeypatch):
+    from sphinxcontrib.autodoc_doxygen import index as index_module, setup
+    from sphinxcontrib.autodoc_doxygen.index import CompoundFilter, DoxygenXmlWatcher
+    from sphinxcontrib.autodoc_doxygen.xmlutils import format_xml_paragraph
+
+    files = []
+    for name, text in sorted(FILTERED.items()):
+        tmpdir.join(name).write(text)
+        files.append(str(tmpdir.join(name)))
+
+    parsed = []
+    read_file = index_module._read_file
+    monkeypatch.setattr(index_module, '_read_file',
+                        lambda file: parsed.append(os.path.basename(file)) or read_file(file))
+
+    compound_filter = CompoundFilter(exclude_kinds=['file'], exclude_prot=['private'])
+    index = DoxygenIndex.from_files(files, compound_filter)
+    assert 'foo_8h.xml' not in parsed
+
+    assert index.compound('foo_8h') is None and index.is_excluded('foo_8h')
+    assert index.is_excluded('foo_8h_1a1')
+    assert index.member('classfoo_1_1widget_1a1').findtext('name') == 'draw'
+    assert index.member('classfoo_1_1widget_1a2') is None
+    assert index.is_excluded('classfoo_1_1widget_1a2')
+    assert not index.is_excluded('classfoo_1_1widget_1a1')
+
+    # references to what was left out are kept as plain text
+    setup.DOXYGEN_INDEX = index
+    try:
+        text = format_xml_paragraph(index.member('namespacefoo_1a1').find('detaileddescription'))
+    finally:
+        del setup.DOXYGEN_INDEX
+    assert ' '.join(' '.join(text).split()) == 'See reset and FOO.'
+
+    del parsed[:]
+    watcher = DoxygenXmlWatcher(compound_filter)
+    watched = watcher.load(files)
+    assert 'foo_8h.xml' not in parsed
+    assert watched.buffer == index.buffer and watched._excluded == index._excluded
+
+    # nothing changed
+    del parsed[:]
+    assert watcher.load(files) is watched and parsed == []
+
+    # only the touched file is parsed again, the excluded one still isn't
+    for name in ('classfoo_1_1widget.xml', 'foo_8h.xml'):
+        st = os.stat(str(tmpdir.join(name)))
+        os.utime(str(tmpdir.join(name)), ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    reloaded = watcher.load(files)
+    assert reloaded is not watched and parsed == ['classfoo_1_1widget.xml']
+    assert reloaded.buffer == index.buffer and reloaded._excluded == index._excluded
+
+    assert CompoundFilter(include_names=['foo']).accepts('namespace', 'foo')
+    assert not CompoundFilter(include_names=['foo']).accepts('class', 'foo::widget')
+    assert CompoundFilter(exclude_names=['*::detail*']).accepts('class', 'foo::widget')
+
+
+def test_brief_is_not_cut(monkeypatch):
+    from mock import Mock
+    from sphinxcontrib.autodoc_doxygen import setup
+    from sphinxcontrib.autodoc_doxygen.xmlutils import _DoxygenXmlParagraphFormatter
+    from sphinxcontrib.autodoc_doxygen.autodoc import DoxygenModuleDocumenter, \
+        DoxygenMethodDocumenter
+
+    corpus = CORPUS.replace(
+        '<compoundname>foo</compoundname>',
+        '<compoundname>foo</compoundname><briefdescription><para>One.</para>'
+        '<para>Two.</para></briefdescription>').replace(
+        '<name>baz</name>',
+        '<name>baz</name><briefdescription><para>Three.</para>'
+        '<para>Four.</para></briefdescription>').replace(
+        '<compoundname>foo::bar</compoundname>',
+        '<compoundname>foo::bar</compoundname><briefdescription/>')
+    setup.DOXYGEN_INDEX = index = DoxygenIndex.from_root(ET.fromstring(corpus))
+    try:
+        module = DoxygenModuleDocumenter(Mock(), 'foo', brief=True)
+        module.object = index.compound('namespacefoo')
+        # the module page shows the whole brief description
+        assert [line for line in module.get_doc()[0] if line] == ['One.', 'Two.']
+
+        method = DoxygenMethodDocumenter(Mock(), 'baz', id='namespacefoo_1a1', brief=True)
+        assert [line for line in method.get_doc()[0] if line] == ['Three.', 'Four.']
+
+        # the summary rows only format the first paragraph
+        visited = []
+        para = _DoxygenXmlParagraphFormatter.handlers['para']
+        monkeypatch.setitem(_DoxygenXmlParagraphFormatter.handlers, 'para',
+                            lambda self, node: visited.append(node.text) or para(self, node))
+        assert module.get_summary() == ['One.', '']
+        assert method.get_summary() == ['Three.', '']
+        assert visited == ['One.', 'Three.']
+
+        undocumented = DoxygenModuleDocumenter(Mock(), 'foo::bar', brief=True)
+        undocumented.object = index.compound('structfoo_1_1bar')
+        assert undocumented.get_summary() == ['<undocumented>', '']
+    finally:
+        del setup.DOXYGEN_INDEX
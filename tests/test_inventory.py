@@ -0,0 +1,90 @@
+import zlib
+
+from sphinxcontrib.autodoc_doxygen import inventory, setup
+
+
+def read_inventory(filename):
+    with open(filename, 'rb') as f:
+        header = [f.readline() for _ in range(4)]
+        body = zlib.decompress(f.read()).decode('utf-8')
+    assert header[0] == b'# Sphinx inventory version 2\n'
+    return [line.split(' ', 4) for line in body.splitlines()]
+
+
+def test_main(tmpdir, capsys):
+    tmpdir.join('xml', 'namespacefoo.xml').write('''<doxygen>
+  <compounddef id="namespacefoo" kind="namespace">
+    <compoundname>foo</compoundname>
+    <innerclass refid="typefoo_1_1bar">foo::bar</innerclass>
+    <sectiondef kind="func">
+      <memberdef kind="function" id="namespacefoo_1a1">
+        <definition>real function foo::norm</definition>
+        <argsstring>(x)</argsstring>
+        <name>norm</name>
+      </memberdef>
+      <memberdef kind="function" id="namespacefoo_1a2">
+        <definition>subroutine foo::reset</definition>
+        <argsstring>()</argsstring>
+        <name>reset</name>
+      </memberdef>
+    </sectiondef>
+  </compounddef>
+  <compounddef id="typefoo_1_1bar" kind="type">
+    <compoundname>foo::bar</compoundname>
+  </compounddef>
+  <compounddef id="intro" kind="page">
+    <compoundname>intro</compoundname>
+    <title>Introduction</title>
+    <detaileddescription><para>Hello.</para></detaileddescription>
+  </compounddef>
+</doxygen>''', ensure=True)
+    tmpdir.join('xml', 'index.xml').write('''<doxygenindex>
+  <compound refid="namespacefoo" kind="namespace"><name>foo</name></compound>
+  <compound refid="typefoo_1_1bar" kind="type"><name>foo::bar</name></compound>
+  <compound refid="intro" kind="page"><name>intro</name></compound>
+</doxygenindex>''')
+    src = tmpdir.join('doc', 'index.rst')
+    src.write('''
+.. autodoxysummary::
+   :toctree: api/
+
+   foo
+
+.. autodoxysummary::
+   :toctree: pages/
+   :generate:
+   :kind: page
+''', ensure=True)
+    output = str(tmpdir.join('objects.inv'))
+
+    try:
+        assert inventory.main(['-x', str(tmpdir.join('xml')), '-o', output,
+                               '--project', 'Foo', str(src)]) == 0
+        assert capsys.readouterr().out == '[doxygen] wrote 6 objects to %s\n' % output
+        # no stubs were written
+        assert tmpdir.join('doc').listdir() == [src]
+
+        assert read_inventory(output) == [
+            ['api/foo', 'std:doc', '-1', 'api/foo.html', 'foo module reference'],
+            ['foo', 'f:module', '0', 'api/foo.html#module-$', '-'],
+            ['foo/bar', 'f:type', '1', 'api/foo.html#$', '-'],
+            ['foo/norm', 'f:function', '1', 'api/foo.html#$', '-'],
+            ['foo/reset', 'f:subroutine', '1', 'api/foo.html#$', '-'],
+            ['pages/intro', 'std:doc', '-1', 'pages/intro.html', 'Introduction'],
+        ]
+
+        # with the module split, its members are on the subpages
+        inventory.main(['-x', str(tmpdir.join('xml')), '-o', output, '--split', '2', str(src)])
+        entries = dict((name, uri) for name, role, priority, uri, dispname
+                       in read_inventory(output))
+        assert entries['foo'] == 'api/foo.html#module-$'
+        assert entries['foo/bar'] == entries['foo/norm'] == 'api/foo-1.html#$'
+        assert entries['foo/reset'] == 'api/foo-2.html#$'
+
+        # filtered out, the pages are not in the inventory
+        inventory.main(['-x', str(tmpdir.join('xml')), '-o', output,
+                        '--exclude-kinds', 'page', str(src)])
+        assert [name for name, role, priority, uri, dispname in read_inventory(output)
+                if role == 'std:doc'] == ['api/foo']
+    finally:
+        del setup.DOXYGEN_INDEX
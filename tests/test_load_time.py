@@ -0,0 +1,124 @@
+"""Keep loading the doxygen XML fast when the files are not cached.
+
+Run this file directly to print how long loading a corpus takes, with the
+files evicted from the page cache first (cold) and then again (warm),
+read ahead in the background as the extension does and one after the
+other with ``ET.parse``::
+
+    python tests/test_load_time.py [path/to/xml]
+
+It defaults to the bundled OpenMM corpus. Evicting the files uses
+``posix_fadvise``, so the cold timings are only meaningful on Linux, for
+local files; on a network filesystem the first run is the cold one.
+"""
+from __future__ import print_function
+
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+
+import lxml.etree as ET
+import pytest
+
+from sphinxcontrib.autodoc_doxygen.index import DoxygenIndex, DoxygenXmlWatcher, _IndexBuilder
+
+OPENMM = os.path.join(os.path.dirname(__file__), os.pardir,
+                      'examples', 'openmm-doxygen-xml.tar.bz2')
+
+
+def xml_files(path):
+    return sorted(os.path.join(path, f) for f in os.listdir(path)
+                  if f.lower().endswith('.xml') and not f.startswith('._'))
+
+
+def load_sequentially(files):
+    """Build the index reading and parsing one file after the other."""
+    builder = _IndexBuilder()
+    for file in files:
+        builder.add(ET.parse(file).getroot())
+    return builder.build()
+
+
+def evict(files):
+    """Drop *files* from the page cache, if the platform lets us."""
+    if not hasattr(os, 'posix_fadvise'):
+        return False
+    for file in files:
+        fd = os.open(file, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    return True
+
+
+def test_read_ahead_loads_the_same_index(tmpdir):
+    with tarfile.open(OPENMM) as tar:
+        tar.extractall(str(tmpdir))
+    path = os.path.join(str(tmpdir), 'xml')
+    files = xml_files(path)
+
+    index = DoxygenIndex.from_files(files)
+    reference = load_sequentially(files)
+    assert index.buffer == reference.buffer
+    assert index.compounds == reference.compounds
+    assert DoxygenXmlWatcher().load(files).buffer == reference.buffer
+
+
+def _reader_threads():
+    return [thread for thread in threading.enumerate()
+            if thread.name == 'doxygen-xml-reader' or
+            thread.name.startswith('ThreadPoolExecutor')]
+
+
+@pytest.mark.parametrize('load', [DoxygenIndex.from_files,
+                                  lambda files: DoxygenXmlWatcher().load(files)])
+def test_malformed_file_leaves_no_threads(tmpdir, load):
+    files = []
+    for i in range(200):
+        filename = tmpdir.join('%03d.xml' % i)
+        filename.write('<doxygen><compounddef id="c%d" kind="class"/></doxygen>' % i)
+        files.append(str(filename))
+    tmpdir.join('000.xml').write('<doxygen><compounddef')
+
+    before = set(_reader_threads())
+    with pytest.raises(ET.XMLSyntaxError):
+        load(files)
+    assert set(_reader_threads()) <= before
+
+
+if __name__ == '__main__':
+    runs = 3
+    tmp = None
+    if len(sys.argv) > 1:
+        path = sys.argv[1]
+    else:
+        tmp = tempfile.mkdtemp()
+        with tarfile.open(OPENMM) as tar:
+            tar.extractall(tmp)
+        path = os.path.join(tmp, 'xml')
+    try:
+        files = xml_files(path)
+        size = sum(os.path.getsize(file) for file in files)
+        print('%d files, %.1f MB' % (len(files), size / 1e6))
+        for title, load in (('read ahead', DoxygenIndex.from_files),
+                            ('sequential', load_sequentially)):
+            for cache in ('cold', 'warm'):
+                times = []
+                for _ in range(runs):
+                    if cache == 'cold' and not evict(files):
+                        break
+                    start = time.perf_counter()
+                    load(files)
+                    times.append(time.perf_counter() - start)
+                if times:
+                    print('%-10s %-4s %8.1f ms (best of %d)'
+                          % (title, cache, min(times) * 1000, runs))
+    finally:
+        if tmp is not None:
+            shutil.rmtree(tmp)
@@ -0,0 +1,71 @@
+import lxml.etree as ET
+from sphinx.util.parallel import make_chunks
+
+from sphinxcontrib.autodoc_doxygen.index import DoxygenIndex
+from sphinxcontrib.autodoc_doxygen.readorder import balance, document_cost, \
+    iter_directives, DESCRIPTION_COST, SUMMARY_ITEM_COST
+
+
+CORPUS = '''<root>
+  <compound refid="namespacefoo" kind="namespace"><name>foo</name></compound>
+  <compound refid="typefoo_1_1bar" kind="type"><name>foo::bar</name></compound>
+  <compounddef id="namespacefoo" kind="namespace">
+    <compoundname>foo</compoundname>
+    <innerclass refid="typefoo_1_1bar" prot="public">foo::bar</innerclass>
+    <sectiondef kind="func">
+      <memberdef kind="function" id="namespacefoo_1a1"><name>baz</name></memberdef>
+      <memberdef kind="function" id="namespacefoo_1a2"><name>qux</name></memberdef>
+    </sectiondef>
+  </compounddef>
+  <compounddef id="typefoo_1_1bar" kind="type">
+    <compoundname>foo::bar</compoundname>
+  </compounddef>
+</root>'''
+
+SOURCE = '''
+API
+===
+
+.. autodoxysummary::
+   :toctree: generated/
+
+   foo
+   foo::bar
+
+.. autodoxymodule:: foo
+   :methods: baz
+   :types:
+
+Done.
+'''
+
+
+def test_document_cost():
+    index = DoxygenIndex.from_root(ET.fromstring(CORPUS))
+    assert index.function_count('foo') == 2
+    namespace, type_ = index.compound_size('foo'), index.compound_size('foo::bar')
+    assert namespace > type_ > 0 and index.compound_size('nope') == 0
+
+    directives = list(iter_directives(SOURCE.splitlines()))
+    assert directives == [
+        ('autodoxysummary', '', {'toctree': 'generated/'}, ['foo', 'foo::bar']),
+        ('autodoxymodule', 'foo', {'methods': 'baz', 'types': ''}, [])]
+
+    assert document_cost(index, SOURCE) == len(SOURCE) + 2 * SUMMARY_ITEM_COST + \
+        DESCRIPTION_COST + namespace / 2 + type_
+    assert document_cost(index, 'Nothing to see here.') == 20
+
+
+def test_balance():
+    costs = dict(('doc%02d' % i, 1) for i in range(40))
+    costs.update(doc03=100, doc04=100, doc05=100, doc06=90)
+    docnames = sorted(costs)
+
+    chunk_costs = balance(docnames, costs, 4)
+    assert sorted(docnames) == sorted(costs)
+    chunks = make_chunks(docnames, 4)
+    assert [sum(costs[d] for d in chunk) for chunk in chunks] == chunk_costs
+    # the giant documents are spread out, and read first
+    assert [len(set(chunk) & {'doc03', 'doc04', 'doc05', 'doc06'}) for chunk in chunks[:4]] \
+        == [1, 1, 1, 1]
+    assert chunk_costs == sorted(chunk_costs, reverse=True)